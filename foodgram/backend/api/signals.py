@@ -0,0 +1,72 @@
+from functools import partial
+
+from core.utils import on_commit_once
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from interaction.models import ShoppingCart
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredient, Tag)
+
+from .v1.catalog import invalidate_catalog
+from .v1.micro_cache import purge_micro_cache
+from .v1.shopping_list import (invalidate_recipe_shopping_lists_on_commit,
+                               invalidate_shopping_list_on_commit)
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def invalidate_cart(sender, instance, **kwargs):
+    """ Reset the cached shopping list of the cart owner after commit """
+    invalidate_shopping_list_on_commit(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_carts(sender, instance, **kwargs):
+    """ Reset cached shopping lists that include the changed recipe """
+    invalidate_recipe_shopping_lists_on_commit(instance.recipe_id)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags_catalog(sender, instance, **kwargs):
+    """ Rebuild the tag list after the change is committed """
+    transaction.on_commit(lambda: invalidate_catalog('tags'))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=MeasurementUnit)
+def invalidate_ingredients_catalog(sender, instance, **kwargs):
+    """ Rebuild the ingredient list after the change is committed """
+    transaction.on_commit(lambda: invalidate_catalog('ingredients'))
+
+
+def purge_after_commit(*zones):
+    """ One purge per zone and transaction, each walks the zone's files """
+    for zone in zones:
+        on_commit_once(f'purge_micro_cache:{zone}',
+                       partial(purge_micro_cache, zone))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def purge_recipes_micro_cache(sender, instance, **kwargs):
+    """ Anonymous recipe pages cached by the gateway are outdated """
+    purge_after_commit('recipes')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def purge_recipes_micro_cache_on_tags(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        purge_after_commit('recipes')
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def purge_tags_micro_cache(sender, instance, **kwargs):
+    """ Tags are listed on their own and inside every recipe """
+    purge_after_commit('tags', 'recipes')
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=MeasurementUnit)
+def purge_ingredients_micro_cache(sender, instance, **kwargs):
+    """ Ingredients are listed on their own and inside every recipe """
+    purge_after_commit('ingredients', 'recipes')
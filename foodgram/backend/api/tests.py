@@ -0,0 +1,822 @@
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future
+from http import HTTPStatus
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.images import variant_names
+from core.spool import spool_path
+from interaction.models import Followers
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredient, Tag)
+
+User = get_user_model()
+
+RECIPES_COUNT = 100
+PAGE_SIZES = (1, 2, 5, 10, 25, 50, 100)
+
+
+class RecipeQueriesTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        unit = MeasurementUnit.objects.create(name='грамм', abbrev='г')
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit=unit)
+            for i in range(3))
+        tags = [Tag.objects.create(name=f'Тег {i}') for i in range(2)]
+        for i in range(RECIPES_COUNT):
+            author = User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                first_name='Имя', last_name='Фамилия')
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Текст',
+                cooking_time=10)
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=i + 1)
+                for ingredient in ingredients)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_list_query_count_is_constant(self):
+        """Query count of the recipe list does not depend on page size."""
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                self.assertEqual(
+                    self.count_queries(f'/api/recipes/?limit={limit}'), 4)
+
+    def test_authenticated_list_query_count_is_constant(self):
+        """Flags and is_subscribed are resolved once for the whole page."""
+        reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        reader.following.create(author=User.objects.get(username='author1'))
+        self.client.force_authenticate(user=reader)
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                self.assertEqual(
+                    self.count_queries(f'/api/recipes/?limit={limit}'), 5)
+        response = self.client.get('/api/recipes/?limit=100')
+        subscribed = {recipe['author']['username']
+                      for recipe in response.json()['results']
+                      if recipe['author']['is_subscribed']}
+        self.assertEqual(subscribed, {'author1'})
+
+    def test_retrieve_query_count(self):
+        """Recipe detail loads the nested graph in fixed queries."""
+        recipe = Recipe.objects.first()
+        self.assertEqual(
+            self.count_queries(f'/api/recipes/{recipe.id}/'), 3)
+
+
+class ShoppingListTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Имя', last_name='Фамилия')
+        unit = MeasurementUnit.objects.create(name='грамм', abbrev='г')
+        salt = Ingredient.objects.create(name='Соль', measurement_unit=unit)
+        sugar = Ingredient.objects.create(name='Сахар', measurement_unit=unit)
+        for amount in (5, 7):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {amount}', text='Текст',
+                cooking_time=10)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=salt, amount=amount)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=sugar, amount=1)
+            cls.user.shopping_cart.create(recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        spool_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_root)
+        settings = override_settings(SPOOL_ROOT=spool_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def download(self, file_format='txt'):
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.getvalue()
+
+    def test_download_shopping_cart(self):
+        """Ingredient amounts are summed over all recipes in the cart."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/download_shopping_cart/')
+            content = response.getvalue().decode()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(content, (
+            'СПИСОК ПОКУПОК\n\n' + '=' * 50 + '\n\n'
+            '1. Сахар - 2 грамм\n'
+            '2. Соль - 12 грамм\n'
+            '\n' + '=' * 50 + '\n'
+            'Всего позиций: 2\n'
+            'Рецептов в списке: 2\n'))
+
+    def test_download_empty_shopping_cart(self):
+        self.user.shopping_cart.all().delete()
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_download_formats(self):
+        self.assertEqual(self.download('csv').decode().splitlines(), [
+            'Ингредиент,Количество,Единица измерения',
+            'Сахар,2,грамм',
+            'Соль,12,грамм'])
+        self.assertTrue(self.download('pdf').startswith(b'%PDF-'))
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=doc')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_repeat_download_is_cached(self):
+        """Repeat download is served from cache until the cart changes."""
+        content = self.download()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.download(), content)
+        recipe = self.user.shopping_cart.first().recipe
+        recipe.ingredient_amounts.update(amount=100)
+        self.assertEqual(self.download(), content)
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe.ingredient_amounts.first().save()
+            self.assertEqual(self.download(), content)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.download(), content)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.shopping_cart.first().delete()
+        self.assertIn('Рецептов в списке: 1', self.download().decode())
+
+    def test_export_is_sent_by_nginx(self):
+        with override_settings(USE_X_ACCEL_REDIRECT=True):
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/?format=csv')
+            self.assertEqual(response.content, b'')
+            location = response['X-Accel-Redirect']
+            self.assertTrue(location.startswith(
+                f'/spool/shopping_lists/{self.user.id}/'))
+            self.assertEqual(response['Content-Disposition'],
+                             'attachment; filename="shopping_list.csv"')
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.shopping_cart.first().delete()
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/?format=csv')
+            self.assertNotEqual(response['X-Accel-Redirect'], location)
+        self.assertEqual(len(os.listdir(spool_path(
+            f'shopping_lists/{self.user.id}'))), 1)
+
+
+class IngredientSearchTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        unit = MeasurementUnit.objects.create(name='грамм', abbrev='г')
+        for name in ('Абрикосы', 'Сок абрикосовый', 'Ёрш',
+                     'Абрикосовое варенье'):
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+
+    def setUp(self):
+        caches['persistent'].clear()
+        self.client = APIClient()
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [item['name'] for item in response.json()]
+
+    def test_prefix_matches_rank_first(self):
+        self.assertEqual(self.search('АБРИКОС'), [
+            'Абрикосовое варенье', 'Абрикосы', 'Сок абрикосовый'])
+        self.assertEqual(self.search('ерш'), ['Ёрш'])
+
+    def test_typos_and_latin_input(self):
+        self.assertEqual(self.search('абрикосвое')[0], 'Абрикосовое варенье')
+        self.assertEqual(self.search('abrikosy'), ['Абрикосы'])
+
+    def test_index_rebuilt_after_change(self):
+        self.assertEqual(self.search('сок'), ['Сок абрикосовый'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(name='Ёрш').get().delete()
+            Ingredient.objects.create(
+                name='Сок вишнёвый',
+                measurement_unit=MeasurementUnit.objects.get())
+        self.assertEqual(self.search('сок'), [
+            'Сок абрикосовый', 'Сок вишнёвый'])
+
+
+class CatalogTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Завтрак')
+
+    def setUp(self):
+        caches['persistent'].clear()
+        self.client = APIClient()
+
+    def test_catalog_etag(self):
+        """Unchanged catalog answers 304, a change produces a new ETag."""
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()[0]['name'], 'Завтрак')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                '/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Обед')
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_catalog_gzip(self):
+        response = self.client.get('/api/tags/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))[0]['slug'],
+            'zavtrak')
+
+
+class RecipePaginationTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {i}', text='Текст',
+                   cooking_time=10, short_id=str(i))
+            for i in range(12))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_pages(self):
+        """Cursor pages walk the whole feed newest first without gaps."""
+        ids = []
+        url = '/api/recipes/?cursor=&limit=5'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            ids.extend(recipe['id'] for recipe in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(ids, sorted(
+            Recipe.objects.values_list('id', flat=True), reverse=True))
+
+
+class RecipeWriteTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        unit = MeasurementUnit.objects.create(name='грамм', abbrev='г')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit=unit)
+            for i in range(30))
+        cls.tags = [Tag.objects.create(name=f'Тег {i}') for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def recipe_data(self, ingredients, tags, **kwargs):
+        return {
+            'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 10,
+            'ingredients': [{'id': ingredient.id, 'amount': amount}
+                            for ingredient, amount in ingredients],
+            'tags': [tag.id for tag in tags], **kwargs}
+
+    def test_create_query_count(self):
+        """Query count of creating a recipe does not grow with ingredients."""
+        counts = []
+        for size in (1, 30):
+            data = self.recipe_data(
+                [(ingredient, 1) for ingredient in self.ingredients[:size]],
+                self.tags)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(
+                    '/api/recipes/', data, format='json')
+            self.assertEqual(response.status_code, HTTPStatus.CREATED)
+            self.assertEqual(len(response.json()['ingredients']), size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_invalid_ids_reported_together(self):
+        data = self.recipe_data([(self.ingredients[0], 1)], self.tags)
+        data['ingredients'] += [{'id': 998, 'amount': 1},
+                                {'id': 999, 'amount': 1}]
+        data['tags'] += [997]
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('998, 999', response.json()['ingredients'][0])
+        self.assertIn('997', response.json()['tags'][0])
+
+    def test_update_applies_only_differences(self):
+        """Unchanged ingredients cause no writes to RecipeIngredient."""
+        first, second, third = self.ingredients[:3]
+        response = self.client.post('/api/recipes/', self.recipe_data(
+            [(first, 1), (second, 2)], self.tags[:2]), format='json')
+        url = f'/api/recipes/{response.json()["id"]}/'
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, self.recipe_data(
+                [(second, 2), (first, 1)], self.tags[:2], name='Новое'),
+                format='json')
+        self.assertEqual(response.json()['name'], 'Новое')
+        writes = [query['sql'] for query in queries
+                  if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                  and 'recipeingredient' in query['sql']]
+        self.assertEqual(writes, [])
+
+        response = self.client.patch(url, self.recipe_data(
+            [(second, 5), (third, 3)], self.tags[1:], name='Новое'),
+            format='json')
+        self.assertEqual(
+            {(item['id'], item['amount'])
+             for item in response.json()['ingredients']},
+            {(second.id, 5), (third.id, 3)})
+        self.assertEqual({tag['id'] for tag in response.json()['tags']},
+                         {tag.id for tag in self.tags[1:]})
+
+
+class RecipeUserFlagsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        unit = MeasurementUnit.objects.create(name='грамм', abbrev='г')
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit=unit)
+        cls.tag = Tag.objects.create(name='Выпечка')
+        cls.favorite, cls.in_cart, cls.plain = Recipe.objects.bulk_create(
+            Recipe(author=cls.author, name=f'Рецепт {i}', text='Текст',
+                   cooking_time=10, short_id=str(i))
+            for i in range(3))
+        cls.reader.favorite_recipes.create(recipe=cls.favorite)
+        cls.reader.shopping_cart.create(recipe=cls.in_cart)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def flags(self, recipe):
+        return recipe['is_favorited'], recipe['is_in_shopping_cart']
+
+    def test_anonymous_flags_are_false(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(
+            {self.flags(recipe) for recipe in response.json()['results']},
+            {(False, False)})
+        response = self.client.get(f'/api/recipes/{self.favorite.id}/')
+        self.assertEqual(self.flags(response.json()), (False, False))
+
+    def test_list_and_retrieve_flags(self):
+        self.client.force_authenticate(user=self.reader)
+        expected = {self.favorite.id: (True, False),
+                    self.in_cart.id: (False, True),
+                    self.plain.id: (False, False)}
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(
+            {recipe['id']: self.flags(recipe)
+             for recipe in response.json()['results']}, expected)
+        for recipe_id, flags in expected.items():
+            with self.subTest(recipe_id=recipe_id):
+                response = self.client.get(f'/api/recipes/{recipe_id}/')
+                self.assertEqual(self.flags(response.json()), flags)
+
+    def test_write_response_flags(self):
+        self.client.force_authenticate(user=self.reader)
+        data = {'name': 'Рецепт', 'text': 'Текст', 'cooking_time': 10,
+                'ingredients': [{'id': self.ingredient.id, 'amount': 1}],
+                'tags': [self.tag.id]}
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertEqual(self.flags(response.json()), (False, False))
+        recipe_id = response.json()['id']
+        self.reader.favorite_recipes.create(recipe_id=recipe_id)
+        self.reader.shopping_cart.create(recipe_id=recipe_id)
+        response = self.client.patch(
+            f'/api/recipes/{recipe_id}/', {**data, 'name': 'Новое'},
+            format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.flags(response.json()), (True, True))
+
+
+class SubscriptionsTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        for i in range(10):
+            author = User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com',
+                first_name='Имя', last_name='Фамилия')
+            for j in range(i + 1):
+                Recipe.objects.create(author=author, name=f'Рецепт {j}',
+                                      text='Текст', cooking_time=10)
+            cls.user.following.create(author=author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_subscriptions_query_count(self):
+        """Subscription cards load in fixed queries whatever the page."""
+        for limit in (1, 10):
+            with self.assertNumQueries(3):
+                response = self.client.get(
+                    f'/api/users/subscriptions/?limit={limit}'
+                    '&recipes_limit=2')
+            authors = response.json()['results']
+            self.assertEqual(len(authors), limit)
+        self.assertEqual(
+            [len(author['recipes']) for author in authors],
+            [1] + [2] * 9)
+        self.assertEqual(
+            [author['recipes_count'] for author in authors],
+            list(range(1, 11)))
+
+    def test_invalid_recipes_limit(self):
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=abc')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class FeedTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.authors = [User.objects.create_user(
+            username=f'author{i}', email=f'author{i}@example.com',
+            first_name='Имя', last_name='Фамилия') for i in range(3)]
+        for author in cls.authors:
+            for i in range(3):
+                Recipe.objects.create(author=author, name=f'Рецепт {i}',
+                                      text='Текст', cooking_time=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.reader)
+
+    def feed_ids(self):
+        ids = []
+        url = '/api/recipes/feed/?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            ids += [recipe['id'] for recipe in response.json()['results']]
+            url = response.json()['next']
+        return ids
+
+    def expected_ids(self, *authors):
+        return list(Recipe.objects.filter(
+            author__in=authors).order_by('-id').values_list('id', flat=True))
+
+    def test_timeline_follows_subscriptions(self):
+        first, second, _ = self.authors
+        for author in (first, second):
+            self.client.post(f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(self.feed_ids(), self.expected_ids(first, second))
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(author=first, name='Новый рецепт',
+                                  text='Текст', cooking_time=10)
+        self.assertEqual(self.feed_ids(), self.expected_ids(first, second))
+        self.client.delete(f'/api/users/{second.id}/subscribe/')
+        self.assertEqual(self.feed_ids(), self.expected_ids(first))
+
+    def test_big_authors_are_merged_on_read(self):
+        first, second, third = self.authors
+        self.client.post(f'/api/users/{first.id}/subscribe/')
+        with patch('interaction.constants.FEED_FANOUT_MAX_FOLLOWERS', 0):
+            self.client.post(f'/api/users/{third.id}/subscribe/')
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe = Recipe.objects.create(
+                    author=third, name='Новый рецепт', text='Текст',
+                    cooking_time=10)
+            self.assertFalse(self.reader.feed_entries.filter(
+                recipe=recipe).exists())
+            self.assertEqual(self.feed_ids(),
+                             self.expected_ids(first, third))
+
+    def test_authors_dropping_to_threshold_are_fanned_out(self):
+        first, second, third = self.authors
+        self.client.post(f'/api/users/{third.id}/subscribe/')
+        other = APIClient()
+        other.force_authenticate(user=first)
+        other.post(f'/api/users/{third.id}/subscribe/')
+        with patch('interaction.constants.FEED_FANOUT_MAX_FOLLOWERS', 1):
+            with self.captureOnCommitCallbacks(execute=True):
+                Recipe.objects.create(author=third, name='Новый рецепт',
+                                      text='Текст', cooking_time=10)
+            self.assertEqual(self.feed_ids(), self.expected_ids(third))
+            with self.captureOnCommitCallbacks(execute=True):
+                other.delete(f'/api/users/{third.id}/subscribe/')
+            self.assertEqual(
+                list(self.reader.feed_entries.order_by(
+                    '-recipe_id').values_list('recipe_id', flat=True)),
+                self.expected_ids(third))
+            self.assertEqual(self.feed_ids(), self.expected_ids(third))
+
+    def test_unfollow_does_not_fan_out(self):
+        author = self.authors[0]
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {i}', text='Текст',
+                   cooking_time=10) for i in range(100))
+        self.client.post(f'/api/users/{author.id}/subscribe/')
+        with self.assertNumQueries(6):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.delete(
+                    f'/api/users/{author.id}/subscribe/')
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+
+    def test_feed_requires_authentication(self):
+        self.assertEqual(APIClient().get('/api/recipes/feed/').status_code,
+                         HTTPStatus.UNAUTHORIZED)
+
+
+class TokenAuthenticationTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='Pass-12345')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        response = self.client.post('/api/auth/token/login/', {
+            'email': 'reader@example.com', 'password': 'Pass-12345'})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.json()["auth_token"]}')
+
+    def test_user_is_cached_until_logout(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code,
+                         HTTPStatus.OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.json()['email'], 'reader@example.com')
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'authtoken_token' in query['sql']])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/tags/').status_code,
+                             HTTPStatus.OK)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'users_customuser' in query['sql']])
+        self.client.post('/api/auth/token/logout/')
+        self.assertEqual(self.client.get('/api/users/me/').status_code,
+                         HTTPStatus.UNAUTHORIZED)
+
+    def test_changes_and_deactivation_apply_at_once(self):
+        self.client.get('/api/users/me/')
+        self.user.first_name = 'Новое'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').json()[
+            'first_name'], 'Новое')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code,
+                         HTTPStatus.UNAUTHORIZED)
+
+    def test_password_change_uses_stored_hash(self):
+        self.client.get('/api/users/me/')
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'Pass-12345',
+            'new_password': 'Other-67890'})
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Other-67890'))
+
+    def test_saving_request_user_keeps_counters(self):
+        self.client.get('/api/users/me/')
+        follower = User.objects.create_user(
+            username='follower', email='follower@example.com',
+            first_name='Имя', last_name='Фамилия', password='Pass-12345')
+        Followers.objects.create(author=self.user, user=follower)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.put('/api/users/me/avatar/', {
+                'avatar': image_data_uri((40, 40))}, format='json')
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.client.delete('/api/users/me/avatar/')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.followers_count, 1)
+
+
+def image_data_uri(size, image_format='JPEG', **params):
+    output = io.BytesIO()
+    Image.new('RGB', size, 'red').save(output, image_format, **params)
+    return (f'data:image/{image_format.lower()};base64,'
+            + base64.b64encode(output.getvalue()).decode())
+
+
+class ImagePipelineTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_upload_is_scaled_stripped_and_has_variants(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010f] = 'Camera'
+        response = self.client.put('/api/users/me/avatar/', {
+            'avatar': image_data_uri((3000, 1000), exif=exif.tobytes())},
+            format='json')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.user.refresh_from_db()
+        with Image.open(self.user.avatar.path) as image:
+            self.assertEqual(image.size, (640, 1920))
+            self.assertFalse(image.getexif())
+        variants = self.client.get('/api/users/me/').json()[
+            'avatar_variants']
+        self.assertEqual(set(variants), {'320', '640'})
+        with Image.open(self.user.avatar.storage.path(
+                variants['320']['webp'].split('/media/')[1])) as image:
+            self.assertEqual((image.format, image.width), ('WEBP', 320))
+
+    def test_uploads_are_shared_and_collected(self):
+        other = User.objects.create_user(
+            username='other', email='other@example.com',
+            first_name='Имя', last_name='Фамилия')
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+        avatar = image_data_uri((100, 100))
+        for client in (self.client, other_client):
+            client.put('/api/users/me/avatar/', {'avatar': avatar},
+                       format='json')
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.user.avatar.name, other.avatar.name)
+        storage = self.user.avatar.storage
+        names = [self.user.avatar.name, *variant_names(self.user.avatar.name)]
+        storage.save('users_avatar/orphan.jpg', io.BytesIO(b'orphan'))
+
+        self.client.delete('/api/users/me/avatar/')
+        call_command('collect_media_garbage', min_age=0, stdout=io.StringIO())
+        self.assertTrue(all(storage.exists(name) for name in names))
+        self.assertEqual(len(os.listdir(storage.path('users_avatar'))),
+                         len(names))
+
+        other_client.delete('/api/users/me/avatar/')
+        call_command('collect_media_garbage', min_age=0, stdout=io.StringIO())
+        self.assertFalse(os.listdir(storage.path('users_avatar')))
+
+    def test_upload_names_are_always_hashed(self):
+        storage = self.user.avatar.storage
+        name = 'users_avatar/' + 'a' * 64 + '.jpg'
+        planted = storage.save(name, io.BytesIO(b'evil'))
+        genuine = storage.save(name, io.BytesIO(b'good'))
+        self.assertNotEqual(planted, genuine)
+        self.assertNotEqual(planted, name)
+        with storage.open(genuine) as file:
+            self.assertEqual(file.read(), b'good')
+
+    def test_legacy_images_keep_variant_names(self):
+        storage = self.user.avatar.storage
+        name = 'users_avatar/image_1700000000_abcd1234.jpg'
+        output = io.BytesIO()
+        Image.new('RGB', (100, 100), 'red').save(output, 'JPEG')
+        os.makedirs(storage.path('users_avatar'))
+        with open(storage.path(name), 'wb') as file:
+            file.write(output.getvalue())
+        User.objects.filter(pk=self.user.pk).update(avatar=name)
+        call_command('build_image_variants', stdout=io.StringIO())
+        self.assertTrue(all(storage.exists(variant)
+                            for variant in variant_names(name)))
+        call_command('collect_media_garbage', min_age=0, stdout=io.StringIO())
+        self.assertEqual(len(os.listdir(storage.path('users_avatar'))),
+                         1 + len(variant_names(name)))
+
+    def test_multipart_upload_is_processed(self):
+        output = io.BytesIO()
+        Image.new('RGB', (3000, 1000), 'red').save(output, 'PNG')
+        upload = SimpleUploadedFile('photo.png', output.getvalue(),
+                                    content_type='image/png')
+        response = self.client.put('/api/users/me/avatar/',
+                                   {'avatar': upload}, format='multipart')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.user.refresh_from_db()
+        with Image.open(self.user.avatar.path) as image:
+            self.assertEqual(image.size, (1920, 640))
+        self.assertTrue(all(self.user.avatar.storage.exists(name)
+                            for name in variant_names(self.user.avatar.name)))
+
+    def test_timeout_is_reported_as_busy(self):
+        pool = Mock(submit=Mock(return_value=Future()))
+        with patch('core.images.get_pool', return_value=pool), \
+                patch('core.images.IMAGE_TIMEOUT', 0.01):
+            response = self.client.put('/api/users/me/avatar/', {
+                'avatar': image_data_uri((100, 100))}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_limits_are_checked(self):
+        with patch('core.utils.IMAGE_MAX_BYTES', 100):
+            response = self.client.put('/api/users/me/avatar/', {
+                'avatar': image_data_uri((100, 100))}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.put('/api/users/me/avatar/', {
+            'avatar': image_data_uri((8000, 6000), 'PNG')}, format='json')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('мегапикселей', response.json()['avatar'][0])
+
+
+class MicroCachePurgeTestCase(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(GATEWAY_CACHE_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for zone in ('recipes', 'tags', 'ingredients'):
+            os.makedirs(os.path.join(self.root, zone, 'a', 'bc'))
+            for name in ('d41d8cd98f00b204e9800998ecf8427e', 'f0.0000000001'):
+                with open(os.path.join(self.root, zone, 'a', 'bc', name),
+                          'w'):
+                    pass
+
+    def cached(self, zone):
+        return sorted(os.listdir(os.path.join(self.root, zone, 'a', 'bc')))
+
+    def test_changes_purge_dependent_zones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Завтрак')
+        self.assertEqual(self.cached('tags'), ['f0.0000000001'])
+        self.assertEqual(self.cached('recipes'), ['f0.0000000001'])
+        self.assertEqual(len(self.cached('ingredients')), 2)
+
+    def test_purge_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            MeasurementUnit.objects.create(name='грамм', abbrev='г')
+            self.assertEqual(len(self.cached('ingredients')), 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.cached('ingredients'), ['f0.0000000001'])
+
+    def test_one_purge_per_transaction(self):
+        with patch('api.signals.purge_micro_cache') as purge:
+            with self.captureOnCommitCallbacks(execute=True):
+                unit = MeasurementUnit.objects.create(name='грамм',
+                                                      abbrev='г')
+                for name in ('Рис', 'Гречка', 'Пшено'):
+                    Ingredient.objects.create(name=name,
+                                              measurement_unit=unit)
+        self.assertEqual(sorted(call.args for call in purge.call_args_list),
+                         [('ingredients',), ('recipes',)])
@@ -0,0 +1,59 @@
+import gzip
+import hashlib
+
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.connection import ConnectionProxy
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from . import constants as const
+
+cache = ConnectionProxy(caches, 'persistent')
+
+
+def build_catalog(data):
+    '''Pre-encode catalog data as JSON and gzip with a content ETag'''
+    body = JSONRenderer().render(data)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return {
+        'body': body,
+        'gzip': gzip.compress(body),
+        'etag': f'"{digest}"',
+        'gzip_etag': f'"{digest}-gz"',
+    }
+
+
+def get_catalog(name, build):
+    key = const.CATALOG_CACHE_KEY.format(name=name)
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_catalog(build())
+        cache.set(key, catalog, None)
+    return catalog
+
+
+def invalidate_catalog(*names):
+    cache.delete_many([
+        const.CATALOG_CACHE_KEY.format(name=name) for name in names])
+
+
+def catalog_response(request, catalog):
+    '''Serve a catalog blob, gzipped when accepted, 304 when unchanged'''
+    use_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    etag = catalog['gzip_etag'] if use_gzip else catalog['etag']
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if '*' in if_none_match or etag in if_none_match:
+        response = HttpResponseNotModified()
+    elif use_gzip:
+        response = HttpResponse(catalog['gzip'],
+                                content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(catalog['body'],
+                                content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = const.CATALOG_CACHE_CONTROL
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -1,7 +1,11 @@
+PAGE_SIZE_MAX = 100
+APPROXIMATE_COUNT_THRESHOLD = 100_000
+
 USER_UNAUTHORIZED_ERROR = 'Не авторизированный пользователь'
 
 SUBSCRIBE_SELF_ADDING_ERROR = 'Нельзя подписываться на самого себя'
 SUBSCRIBE_ALREADY_ERROR = 'Уже подписан'
+RECIPES_LIMIT_ERROR = 'Ожидается целое неотрицательное число'
 
 SHOPPING_CART_ADDING_ERROR = 'Присутствует в списке покупок'
 SHOPPING_CART_EMPTY_ERROR = 'Список пуст'
@@ -11,9 +15,26 @@ SHOPPING_LIST_SEPARATOR = '=' * 50
 SHOPPING_LIST_ITEM_FORMAT = '{index}. {name} - {amount} {unit}'
 SHOPPING_LIST_TOTAL_ITEMS = 'Всего позиций: {count}'
 SHOPPING_LIST_TOTAL_RECIPES = 'Рецептов в списке: {count}'
-SHOPPING_LIST_FILENAME = 'shopping_list.txt'
+SHOPPING_LIST_FILENAME = 'shopping_list.{format}'
 SHOPPING_LIST_CONTENT_TYPE = 'text/plain; charset=utf-8'
+SHOPPING_LIST_CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+SHOPPING_LIST_PDF_CONTENT_TYPE = 'application/pdf'
+SHOPPING_LIST_CSV_HEADER = ('Ингредиент', 'Количество', 'Единица измерения')
 SHOPPING_LIST_EMPTY_ERROR = 'Список покупок пуст'
+SHOPPING_LIST_FORMAT_ERROR = 'Доступные форматы: {formats}'
+SHOPPING_LIST_DEFAULT_FORMAT = 'txt'
+SHOPPING_LIST_SPOOL_DIR = 'shopping_lists/{user_id}'
+SHOPPING_LIST_SPOOL_NAME = '{version}.{format}'
+SHOPPING_CART_VERSION_KEY = 'shopping_cart_version:{user_id}'
+
+PANTRY_INGREDIENTS_ERROR = 'Укажите id ингредиентов через запятую'
+
+SIMILAR_RECIPES_LIMIT = 6
 
 FAVORITE_ADDING_ERROR = 'Рецепт уже добавлен в избранное'
 FAVORITE_EMPTY_ERROR = 'Список пуст'
+
+CATALOG_CACHE_KEY = 'catalog:{name}'
+CATALOG_CACHE_CONTROL = 'public, no-cache'
+
+SHORT_LINK_MAX_AGE = 60 * 60 * 24 * 30
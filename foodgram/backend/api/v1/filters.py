@@ -1,6 +1,17 @@
 from django_filters import rest_framework as filters
 from interaction.models import ShoppingCart
 from recipes.models import Recipe, Tag
+from recipes.recipe_index import recipe_index
+from recipes.search import search_recipes
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -11,10 +22,18 @@ class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'ingredients', 'exclude_ingredients', 'search',
+                  'ordering']
 
     def filter_is_favorited(self, queryset, name, value):
         '''Favorite filter'''
@@ -30,3 +49,28 @@ class RecipeFilter(filters.FilterSet):
             ).values_list('recipe_id', flat=True)
             return queryset.filter(id__in=cart_ids)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        '''Full-text search over name and text, ranked by relevance'''
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        '''Order by stored popularity or trending score'''
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
+    def filter_ingredients(self, queryset, name, value):
+        '''Recipes with all given ingredients and none of the excluded,
+        intersected in the in-memory index'''
+        index = recipe_index.get()
+        recipe_ids = index.recipes_with_all(map(int, value))
+        excluded = self.form.cleaned_data.get('exclude_ingredients')
+        if excluded:
+            recipe_ids -= index.recipes_with_any(map(int, excluded))
+        return queryset.filter(id__in=recipe_ids)
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        '''Recipes without any of the given ingredients'''
+        if self.form.cleaned_data.get('ingredients'):
+            return queryset
+        return queryset.exclude(
+            id__in=recipe_index.get().recipes_with_any(map(int, value)))
@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+
+
+def purge_micro_cache(*zones):
+    '''Remove the gateway cache files of the zones.
+
+    The gateway keeps its cache in a volume shared with the backend, and
+    nginx treats a missing cache file as a miss, so deleting the files
+    drops every cached query string of a zone at once. Files still being
+    written have a temporary suffix and are left alone.
+    '''
+    if not settings.GATEWAY_CACHE_ROOT:
+        return
+    for zone in zones:
+        for root, _, files in os.walk(
+                os.path.join(settings.GATEWAY_CACHE_ROOT, zone)):
+            for name in files:
+                if '.' not in name:
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except FileNotFoundError:
+                        pass
@@ -1,6 +1,8 @@
 from rest_framework import mixins, status, viewsets
 from rest_framework.response import Response
 
+from .catalog import catalog_response, get_catalog
+
 
 class UpdateDeleteViewSet(mixins.CreateModelMixin, mixins.DestroyModelMixin,
                           viewsets.GenericViewSet):
@@ -37,3 +39,16 @@ class UserRelationMixin:
             return Response(
                 {'error': not_found_message},
                 status=status.HTTP_404_NOT_FOUND)
+
+
+class CatalogListMixin:
+    """Serve the unfiltered list from a pre-encoded catalog blob"""
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        catalog = get_catalog(
+            self.catalog_name,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data)
+        return catalog_response(request, catalog)
@@ -1,9 +1,14 @@
-from rest_framework.pagination import LimitOffsetPagination
+from django.db import connections
+from django.db.models import QuerySet
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+from . import constants as const
 
 
 class PagePagination(LimitOffsetPagination):
     page_query_param = 'page'
     page_size = 5
+    max_limit = const.PAGE_SIZE_MAX
 
     def get_offset(self, request):
         page = request.query_params.get(self.page_query_param)
@@ -15,3 +20,50 @@ class PagePagination(LimitOffsetPagination):
                     limit = self.page_size
                 return (page_num - 1) * limit
         return super().get_offset(request)
+
+    def get_count(self, queryset):
+        '''Planner estimate instead of COUNT(*) for big unfiltered tables'''
+        if not isinstance(queryset, QuerySet):
+            return super().get_count(queryset)
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= const.APPROXIMATE_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().get_count(queryset)
+
+
+class FeedCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size = 5
+    page_size_query_param = 'limit'
+    max_page_size = const.PAGE_SIZE_MAX
+
+    def get_ordering(self, request, queryset, view):
+        '''Keep the ordering chosen by the filters, e.g. ?ordering=popular'''
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipePagination(PagePagination):
+    '''Page/limit pagination, keyset pagination when ?cursor= is given'''
+    cursor_pagination_class = FeedCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        if cursor_param in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,11 +1,16 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
-from core.utils import Base64ImageField
+from core.utils import Base64ImageField, ImageVariantsField
 from interaction.models import Favorites, Followers, ShoppingCart
 from recipes.constants import MAX_AMOUNT, MIN_AMOUNT
 from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
-from users.serializers import UserSerializer
+from recipes.recipe_index import recipe_changes
+from recipes.similarity import refresh_minhash
+from users.serializers import RecipeShortSerializer, UserSerializer
+
+from .shopping_list import invalidate_recipe_shopping_lists_on_commit
 
 
 User = get_user_model()
@@ -44,7 +49,7 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientWriteSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         min_value=MIN_AMOUNT,
         max_value=MAX_AMOUNT,
@@ -62,14 +67,17 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                                                  source='ingredient_amounts')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField(source='image')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'image_variants', 'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Favorites.objects.filter(
@@ -77,6 +85,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return ShoppingCart.objects.filter(
@@ -86,8 +96,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField(required=False)
 
     class Meta:
@@ -95,36 +104,79 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         exclude = ['author']
 
     def validate(self, data):
+        errors = {}
         if 'ingredients' in data:
-            if len(data['ingredients']) == 0:
-                raise serializers.ValidationError({
-                    'ingredients':
-                      ['Список ингредиентов не может быть пустым']})
-
             ingredient_ids = [
-                ingredient_data['id'].id for ingredient_data in data[
+                ingredient_data['id'] for ingredient_data in data[
                     'ingredients']]
-            if len(ingredient_ids) != len(set(ingredient_ids)):
-                raise serializers.ValidationError({
-                    'ingredients': ['Ингредиенты не должны повторяться']})
-        if 'ingredients' not in data:
-            raise serializers.ValidationError({
-                'ingredients': ['Обязательное поле']})
+            if len(ingredient_ids) == 0:
+                errors['ingredients'] = [
+                    'Список ингредиентов не может быть пустым']
+            elif len(ingredient_ids) != len(set(ingredient_ids)):
+                errors['ingredients'] = ['Ингредиенты не должны повторяться']
+            else:
+                missing = self.get_missing_ids(Ingredient, ingredient_ids)
+                if missing:
+                    errors['ingredients'] = [
+                        f'Ингредиенты не найдены: {missing}']
+        else:
+            errors['ingredients'] = ['Обязательное поле']
 
         if 'tags' in data:
-            if len(data['tags']) == 0:
-                raise serializers.ValidationError({
-                    'tags': ['Список тегов не может быть пустым.']})
-
-            tag_ids = [tag.id for tag in data['tags']]
-            if len(tag_ids) != len(set(tag_ids)):
-                raise serializers.ValidationError({
-                    'tags': ['Теги не должны повторяться']})
-        if 'tags' not in data:
-            raise serializers.ValidationError({
-                'tags': ['Обязательное поле']})
+            tag_ids = data['tags']
+            if len(tag_ids) == 0:
+                errors['tags'] = ['Список тегов не может быть пустым.']
+            elif len(tag_ids) != len(set(tag_ids)):
+                errors['tags'] = ['Теги не должны повторяться']
+            else:
+                missing = self.get_missing_ids(Tag, tag_ids)
+                if missing:
+                    errors['tags'] = [f'Теги не найдены: {missing}']
+        else:
+            errors['tags'] = ['Обязательное поле']
+
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
+    def get_missing_ids(self, model, ids):
+        """ Check all referenced ids with one query """
+        existing = set(model.objects.filter(
+            pk__in=ids).values_list('pk', flat=True))
+        return ', '.join(str(pk) for pk in ids if pk not in existing)
+
+    def create_ingredient_amounts(self, recipe, ingredients_data):
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe,
+                             ingredient_id=ingredient_data['id'],
+                             amount=ingredient_data['amount'])
+            for ingredient_data in ingredients_data)
+        recipe_changes.record(recipe.id)
+
+    def update_ingredient_amounts(self, recipe, ingredients_data):
+        """ Apply only added, changed and removed ingredients """
+        existing = {item.ingredient_id: item
+                    for item in recipe.ingredient_amounts.all()}
+        amounts = {ingredient_data['id']: ingredient_data['amount']
+                   for ingredient_data in ingredients_data}
+        added = [{'id': pk, 'amount': amount}
+                 for pk, amount in amounts.items() if pk not in existing]
+        removed = [item.id for pk, item in existing.items()
+                   if pk not in amounts]
+        changed = []
+        for pk, item in existing.items():
+            if pk in amounts and item.amount != amounts[pk]:
+                item.amount = amounts[pk]
+                changed.append(item)
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            self.create_ingredient_amounts(recipe, added)
+        return bool(added or removed or changed)
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context['request'].user
         ingredients_data = validated_data.pop('ingredients')
@@ -132,25 +184,23 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(
             author=author,
             **validated_data)
-        for ingredient_data in ingredients_data:
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                ingredient=ingredient_data['id'],
-                amount=ingredient_data['amount'])
+        self.create_ingredient_amounts(recipe, ingredients_data)
+        refresh_minhash(recipe.id, [ingredient_data['id']
+                                    for ingredient_data in ingredients_data])
         recipe.tags.set(tags_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'tags' in validated_data:
             instance.tags.set(validated_data['tags'])
-        if 'ingredients' in validated_data:
-            instance.ingredient_amounts.all().delete()
-            ingredients_data = validated_data['ingredients']
-            for ingredient_data in ingredients_data:
-                RecipeIngredient.objects.create(
-                    recipe=instance,
-                    ingredient=ingredient_data['id'],
-                    amount=ingredient_data['amount'])
+        if ('ingredients' in validated_data
+                and self.update_ingredient_amounts(
+                    instance, validated_data['ingredients'])):
+            invalidate_recipe_shopping_lists_on_commit(instance.id)
+            refresh_minhash(instance.id, [
+                ingredient_data['id']
+                for ingredient_data in validated_data['ingredients']])
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
@@ -161,4 +211,25 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return instance
 
     def to_representation(self, instance):
+        queryset = Recipe.objects.with_related()
+        request = self.context.get('request')
+        if request:
+            queryset = queryset.with_user_flags(request.user)
+        instance = queryset.get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=self.context).data
+
+
+class PantryRecipeSerializer(RecipeShortSerializer):
+    coverage = serializers.FloatField()
+    missing_ingredients = IngredientSerializer(many=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + (
+            'coverage', 'missing_ingredients')
+
+
+class SimilarRecipeSerializer(RecipeShortSerializer):
+    similarity = serializers.FloatField()
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + ('similarity',)
@@ -0,0 +1,116 @@
+import csv
+import uuid
+from functools import partial
+
+from core.pdf import text_to_pdf
+from core.utils import on_commit_once
+from django.core.cache import cache
+from django.db.models import Sum
+from interaction.models import ShoppingCart
+from recipes.models import RecipeIngredient
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from . import constants as const
+
+
+class ShoppingListContentNegotiation(DefaultContentNegotiation):
+    '''Ignore ?format=, it selects the file type instead of the renderer'''
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class Echo:
+    '''File-like object that returns what is written, for csv.writer'''
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    '''Ingredient totals of the user's shopping cart in one grouped query'''
+    return RecipeIngredient.objects.filter(
+        recipe__in_shopping_cart__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit__name'
+    ).annotate(total=Sum('amount')).order_by('ingredient__name')
+
+
+def render_shopping_list(ingredients, recipes_count):
+    '''Yield the text shopping list line by line'''
+    yield f"{const.SHOPPING_LIST_TITLE}\n\n"
+    yield f"{const.SHOPPING_LIST_SEPARATOR}\n\n"
+    count = 0
+    for count, item in enumerate(ingredients, 1):
+        yield const.SHOPPING_LIST_ITEM_FORMAT.format(
+            index=count,
+            name=item['ingredient__name'],
+            amount=item['total'],
+            unit=item['ingredient__measurement_unit__name']) + "\n"
+    yield f"\n{const.SHOPPING_LIST_SEPARATOR}\n"
+    yield const.SHOPPING_LIST_TOTAL_ITEMS.format(count=count) + "\n"
+    yield const.SHOPPING_LIST_TOTAL_RECIPES.format(
+        count=recipes_count) + "\n"
+
+
+def render_shopping_list_csv(ingredients, recipes_count):
+    '''Yield the shopping list as CSV rows'''
+    writer = csv.writer(Echo())
+    yield writer.writerow(const.SHOPPING_LIST_CSV_HEADER)
+    for item in ingredients:
+        yield writer.writerow((item['ingredient__name'], item['total'],
+                               item['ingredient__measurement_unit__name']))
+
+
+def render_shopping_list_pdf(ingredients, recipes_count):
+    '''Yield the text shopping list as a single PDF document'''
+    content = ''.join(render_shopping_list(ingredients, recipes_count))
+    yield text_to_pdf(content.splitlines())
+
+
+SHOPPING_LIST_RENDERERS = {
+    'txt': (render_shopping_list, const.SHOPPING_LIST_CONTENT_TYPE),
+    'csv': (render_shopping_list_csv, const.SHOPPING_LIST_CSV_CONTENT_TYPE),
+    'pdf': (render_shopping_list_pdf, const.SHOPPING_LIST_PDF_CONTENT_TYPE),
+}
+
+
+def get_cart_version(user_id):
+    '''Current version of the user's cart, rotated on every change'''
+    key = const.SHOPPING_CART_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate_shopping_list(*user_ids):
+    '''Drop cart versions so cached shopping lists are rendered again'''
+    cache.delete_many([
+        const.SHOPPING_CART_VERSION_KEY.format(user_id=user_id)
+        for user_id in user_ids])
+
+
+def invalidate_recipe_shopping_lists(recipe_id):
+    '''Drop cached shopping lists of every cart holding the recipe'''
+    invalidate_shopping_list(*ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+def get_spool_name(user_id, file_format):
+    '''Spooled export of the current cart version and its version prefix'''
+    version = get_cart_version(user_id)
+    directory = const.SHOPPING_LIST_SPOOL_DIR.format(user_id=user_id)
+    return f"{directory}/" + const.SHOPPING_LIST_SPOOL_NAME.format(
+        version=version, format=file_format), version
+
+
+def invalidate_shopping_list_on_commit(user_id):
+    '''Drop the cart version once the change commits, so a download in
+    between cannot store old amounts under the new version'''
+    on_commit_once(f'shopping_list:{user_id}',
+                   partial(invalidate_shopping_list, user_id))
+
+
+def invalidate_recipe_shopping_lists_on_commit(recipe_id):
+    on_commit_once(f'recipe_shopping_lists:{recipe_id}',
+                   partial(invalidate_recipe_shopping_lists, recipe_id))
@@ -1,25 +1,42 @@
+import re
+
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
-from django.shortcuts import redirect, get_object_or_404
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from backend.settings import DNS_SERVER_NAME
+from core.spool import is_spooled, spooled_response, write_spool
+from interaction.feed import feed_recipes
 from interaction.models import Favorites, Followers, ShoppingCart
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.recipe_index import recipe_index
+from recipes.short_links import resolve_short_id
+from recipes.similarity import similar_recipes
 from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes
-from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from users.serializers import (RecipeShortSerializer, UserAvatarSerializer,
-                               UserSerializer, UserSubscribeSerializer)
+                               UserSerializer, UserSubscribeSerializer,
+                               reset_followed_author_ids)
 
 from .filters import RecipeFilter
-from .mixins import UserRelationMixin
+from .mixins import CatalogListMixin, UserRelationMixin
+from .pagination import (FeedCursorPagination, PagePagination,
+                         RecipePagination)
 from .permissions import IsAuthenticatedForCreate, IsAuthorForEdit
-from .serializers import (IngredientSerializer, RecipeReadSerializer,
-                          RecipeWriteSerializer, TagSerializer)
+from .serializers import (IngredientSerializer, PantryRecipeSerializer,
+                          RecipeReadSerializer, RecipeWriteSerializer,
+                          SimilarRecipeSerializer, TagSerializer)
+from .shopping_list import (SHOPPING_LIST_RENDERERS,
+                            ShoppingListContentNegotiation, get_shopping_list,
+                            get_spool_name)
 from . import constants as const
 
 
@@ -34,11 +51,31 @@ def me(request):
     return Response(serializer.data)
 
 
+def get_recipes_limit(request, param='recipes_limit'):
+    ''' Parse a non-negative limit such as ?recipes_limit= '''
+    limit = request.query_params.get(param)
+    if not limit:
+        return None
+    if not limit.isdigit():
+        raise serializers.ValidationError(
+            {param: const.RECIPES_LIMIT_ERROR})
+    return int(limit)
+
+
 class SubscriptionsList(ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return User.objects.filter(followers__user=self.request.user)
+        recipes = Recipe.objects.only('id', 'author_id', 'name', 'image',
+                                      'cooking_time')
+        limit = get_recipes_limit(self.request)
+        if limit is not None:
+            recipes = recipes[:limit]
+        return User.objects.filter(
+            followers__user=self.request.user
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        ).order_by('id')
 
     def get_serializer_class(self):
         return UserSubscribeSerializer
@@ -56,10 +93,13 @@ class Subscribe(APIView):
         if self.request.user == author:
             raise serializers.ValidationError(
                 {"error": const.SUBSCRIBE_SELF_ADDING_ERROR})
+        recipes_limit = get_recipes_limit(request)
         _, created = Followers.objects.get_or_create(user=user, author=author)
+        reset_followed_author_ids(request)
         if created:
-            serializer = UserSubscribeSerializer(author,
-                                                 context={'request': request})
+            serializer = UserSubscribeSerializer(
+                author, context={'request': request,
+                                 'recipes_limit': recipes_limit})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response({"error": const.SUBSCRIBE_ALREADY_ERROR},
@@ -70,6 +110,7 @@ class Subscribe(APIView):
         author = get_object_or_404(User, pk=self.kwargs['pk'])
         deleted, _ = Followers.objects.filter(
             user=request.user, author=author).delete()
+        reset_followed_author_ids(request)
         if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         else:
@@ -102,14 +143,13 @@ class UserViewSet(UserRelationMixin, viewsets.ModelViewSet):
             return Response(
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         elif request.method == 'DELETE':
-            if user.avatar:
-                user.avatar.delete(save=False)
             user.avatar = None
-            user.save()
+            user.save(update_fields=['avatar'])
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagReadOnlyViewSet(ReadOnlyModelViewSet):
+class TagReadOnlyViewSet(CatalogListMixin, ReadOnlyModelViewSet):
+    catalog_name = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
@@ -121,6 +161,13 @@ class RecipesViewSet(UserRelationMixin, viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     permission_classes = [IsAuthenticatedForCreate, IsAuthorForEdit]
     filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset().with_user_flags(self.request.user)
+        if self.action in ['list', 'retrieve']:
+            return queryset.with_related()
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -159,41 +206,100 @@ class RecipesViewSet(UserRelationMixin, viewsets.ModelViewSet):
                 {'error': const.SHOPPING_CART_EMPTY_ERROR},
                 status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['GET'], url_path='download_shopping_cart')
+    @action(detail=False, methods=['GET'], url_path='download_shopping_cart',
+            permission_classes=[IsAuthenticated],
+            content_negotiation_class=ShoppingListContentNegotiation)
     def download_shopping_cart(self, request):
-        user = request.user
-        shopping_cart = ShoppingCart.objects.filter(
-            user=user).select_related('recipe')
-        if not shopping_cart.exists():
+        file_format = request.query_params.get(
+            'format', const.SHOPPING_LIST_DEFAULT_FORMAT)
+        if file_format not in SHOPPING_LIST_RENDERERS:
             return Response(
-                {'error': const.SHOPPING_LIST_EMPTY_ERROR},
+                {'error': const.SHOPPING_LIST_FORMAT_ERROR.format(
+                    formats=', '.join(SHOPPING_LIST_RENDERERS))},
                 status=status.HTTP_400_BAD_REQUEST)
-        ingredients_dict = {}
-        for item in shopping_cart:
-            recipe = item.recipe
-            for ingredient_amount in recipe.ingredient_amounts.all():
-                ingredient = ingredient_amount.ingredient
-                key = (ingredient.id, ingredient.name,
-                       ingredient.measurement_unit.name)
-                if key in ingredients_dict:
-                    ingredients_dict[key] += ingredient_amount.amount
-                else:
-                    ingredients_dict[key] = ingredient_amount.amount
-        content = f"{const.SHOPPING_LIST_TITLE}\n\n"
-        content += f"{const.SHOPPING_LIST_SEPARATOR}\n\n"
-        for i, ((ingredient_id, name, unit), amount) in enumerate(
-                ingredients_dict.items(), 1):
-            content += f"{i}. {name} - {amount} {unit}\n"
-        content += f"\n{const.SHOPPING_LIST_SEPARATOR}\n"
-        content += const.SHOPPING_LIST_TOTAL_ITEMS.format(
-            count=len(ingredients_dict)) + "\n"
-        content += const.SHOPPING_LIST_TOTAL_RECIPES.format(
-            count=shopping_cart.count()) + "\n"
-        response = HttpResponse(
-            content, content_type=const.SHOPPING_LIST_CONTENT_TYPE)
-        response['Content-Disposition'] = (
-            f'attachment; filename="{const.SHOPPING_LIST_FILENAME}"')
-        return response
+        render, content_type = SHOPPING_LIST_RENDERERS[file_format]
+        name, version = get_spool_name(request.user.id, file_format)
+        if not is_spooled(name):
+            recipes_count = request.user.shopping_cart.count()
+            if not recipes_count:
+                return Response(
+                    {'error': const.SHOPPING_LIST_EMPTY_ERROR},
+                    status=status.HTTP_400_BAD_REQUEST)
+            ingredients = get_shopping_list(request.user).iterator()
+            write_spool(name, render(ingredients, recipes_count),
+                        keep=version)
+        return spooled_response(
+            name, content_type,
+            const.SHOPPING_LIST_FILENAME.format(format=file_format))
+
+    @action(detail=False, methods=['GET'], url_path='pantry',
+            pagination_class=PagePagination)
+    def pantry(self, request):
+        ''' Add endpoint api/recipes/pantry/?ingredients=1,2,3
+        Recipes ranked by the share of ingredients the user has '''
+        ingredient_ids = request.query_params.get('ingredients', '')
+        if not re.fullmatch(r'\d+(,\d+)*', ingredient_ids):
+            raise serializers.ValidationError(
+                {'ingredients': const.PANTRY_INGREDIENTS_ERROR})
+        ingredient_ids = {int(pk) for pk in ingredient_ids.split(',')}
+        ranking = self.paginate_queryset(
+            recipe_index.get().rank_by_pantry(ingredient_ids))
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time'
+        ).prefetch_related(Prefetch(
+            'ingredient_amounts',
+            queryset=RecipeIngredient.objects.exclude(
+                ingredient_id__in=ingredient_ids
+            ).select_related('ingredient__measurement_unit'),
+            to_attr='missing_amounts'
+        )).in_bulk([recipe_id for recipe_id, _ in ranking])
+        page = []
+        for recipe_id, coverage in ranking:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(coverage, 2)
+            recipe.missing_ingredients = [
+                amount.ingredient for amount in recipe.missing_amounts]
+            page.append(recipe)
+        serializer = PantryRecipeSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='feed',
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedCursorPagination)
+    def feed(self, request):
+        ''' Add endpoint api/recipes/feed/
+        Newest recipes of followed authors from the user's timeline '''
+        queryset = feed_recipes(request.user).with_user_flags(
+            request.user).with_related()
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeReadSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['GET'], url_path='similar')
+    def similar(self, request, pk=None):
+        ''' Add endpoint api/recipes/{pk}/similar/?limit=6
+        Recipes with the closest ingredient sets by Jaccard similarity '''
+        recipe = get_object_or_404(Recipe.objects.only('id', 'minhash'),
+                                   pk=pk)
+        limit = get_recipes_limit(request, 'limit')
+        if limit is None:
+            limit = const.SIMILAR_RECIPES_LIMIT
+        ranking = similar_recipes(recipe, min(limit, const.PAGE_SIZE_MAX))
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'cooking_time'
+        ).in_bulk([recipe_id for recipe_id, _ in ranking])
+        result = []
+        for recipe_id, similarity in ranking:
+            if recipe_id in recipes:
+                recipes[recipe_id].similarity = round(similarity, 2)
+                result.append(recipes[recipe_id])
+        serializer = SimilarRecipeSerializer(
+            result, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
 
     @action(detail=True, methods=['POST', 'DELETE'], url_path='favorite')
     def favorite(self, request, pk=None):
@@ -220,23 +326,33 @@ class RecipesViewSet(UserRelationMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST)
 
 
-class IngredientReadOnlyViewSet(ReadOnlyModelViewSet):
-    queryset = Ingredient.objects.all()
+class IngredientReadOnlyViewSet(CatalogListMixin, ReadOnlyModelViewSet):
+    catalog_name = 'ingredients'
+    queryset = Ingredient.objects.select_related('measurement_unit')
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (DjangoFilterBackend,)
-    filterset_fields = ('name',)
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        ''' Search by name: prefix matches first, then substring,
+        typo-tolerant matches when nothing is found '''
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_index.get().lookup(name))
+        return super().list(request, *args, **kwargs)
 
-class RecipeByShortId(RetrieveAPIView):
-    ''' Get recipe by short_id '''
-    queryset = Recipe.objects.all()
-    serializer_class = RecipeReadSerializer
+
+class RecipeByShortId(APIView):
+    ''' Redirect a short link to the recipe page '''
     permission_classes = [AllowAny]
-    lookup_field = 'short_id'
-    lookup_url_kwarg = 'short_id'
 
-    def get(self, request, *args, **kwargs):
-        recipe = self.get_object()
-        return redirect(f'http://{DNS_SERVER_NAME}:8000/recipes/{recipe.id}/')
+    def get(self, request, short_id):
+        try:
+            recipe_id = resolve_short_id(short_id)
+        except Recipe.DoesNotExist:
+            raise Http404
+        response = HttpResponsePermanentRedirect(
+            f'http://{DNS_SERVER_NAME}:8000/recipes/{recipe_id}/')
+        patch_cache_control(response, public=True,
+                            max_age=const.SHORT_LINK_MAX_AGE)
+        return response
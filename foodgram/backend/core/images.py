@@ -0,0 +1,178 @@
+import io
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from PIL import Image, ImageOps
+
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIDE = 1920
+IMAGE_WIDTHS = (320, 640)
+IMAGE_VARIANT_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+IMAGE_QUALITY = 85
+IMAGE_WORKERS = 2
+IMAGE_QUEUE_SIZE = 8
+IMAGE_TIMEOUT = 30
+VARIANT_NAME_RE = re.compile(r'^(.+)_\d+w\.\w+$')
+
+IMAGE_SIZE_ERROR = 'Файл больше {size} МБ'
+IMAGE_PIXELS_ERROR = 'Изображение больше {pixels} мегапикселей'
+IMAGE_INVALID_ERROR = 'Не удалось прочитать изображение'
+IMAGE_BUSY_ERROR = 'Сервер занят обработкой изображений, повторите позже'
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(IMAGE_QUEUE_SIZE)
+
+
+class ImageUpload(ContentFile):
+    """Processed image together with its encoded variants"""
+
+    def __init__(self, content, name, variants):
+        super().__init__(content, name=name)
+        self.variants = variants
+
+
+def variant_suffix(width, extension):
+    return f'{width}w.{extension}'
+
+
+def variant_name(name, suffix):
+    """Storage name of a variant stored next to the original"""
+    return f'{os.path.splitext(name)[0]}_{suffix}'
+
+
+def variant_source_root(name):
+    """Name of the original without extension if this is a variant"""
+    match = VARIANT_NAME_RE.match(name)
+    return match.group(1) if match else None
+
+
+def variant_names(name):
+    return [variant_name(name, variant_suffix(width, extension))
+            for width in IMAGE_WIDTHS
+            for extension in IMAGE_VARIANT_FORMATS]
+
+
+def save_variant(storage, name, content):
+    """Save a variant under the name derived from its original"""
+    save = getattr(storage, 'save_derived', storage.save)
+    return save(name, ContentFile(content))
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, image_format, quality=IMAGE_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def process_image(data):
+    """Check, down-scale and re-encode an upload, runs in the pool.
+
+    Only the header is parsed before the pixel limit is checked. The
+    EXIF orientation is applied to the pixels and the metadata itself is
+    dropped, as the images are encoded again without it.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            if width * height > IMAGE_MAX_PIXELS:
+                raise ValueError(IMAGE_PIXELS_ERROR.format(
+                    pixels=IMAGE_MAX_PIXELS // 1_000_000))
+            image = ImageOps.exif_transpose(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError(IMAGE_INVALID_ERROR)
+    transparent = (image.mode in ('RGBA', 'LA')
+                   or 'transparency' in image.info)
+    image = image.convert('RGBA' if transparent else 'RGB')
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    extension, image_format = ('png', 'PNG') if transparent else ('jpg',
+                                                                  'JPEG')
+    variants = {}
+    for width in IMAGE_WIDTHS:
+        resized = image
+        if width < image.width:
+            resized = image.resize(
+                (width, max(1, round(image.height * width / image.width))),
+                Image.LANCZOS)
+        for variant_extension, variant_format in (
+                IMAGE_VARIANT_FORMATS.items()):
+            variants[variant_suffix(width, variant_extension)] = _encode(
+                resized, variant_format)
+    return extension, _encode(image, image_format), variants
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return _pool
+
+
+def run_in_pool(data):
+    """Process an image in the worker pool, waiting for a free slot"""
+    global _pool
+    if not _slots.acquire(timeout=IMAGE_TIMEOUT):
+        raise ValueError(IMAGE_BUSY_ERROR)
+    future = None
+    try:
+        future = get_pool().submit(process_image, data)
+        return future.result(timeout=IMAGE_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise ValueError(IMAGE_BUSY_ERROR)
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        raise ValueError(IMAGE_BUSY_ERROR)
+    finally:
+        _slots.release()
+
+
+class VariantImageFieldFile(ImageFieldFile):
+
+    def delete(self, save=True):
+        """Only detach the file, it may be shared with other instances.
+
+        Unreferenced originals and variants are removed by the
+        collect_media_garbage command.
+        """
+        if not self:
+            return
+        if hasattr(self, '_file'):
+            self.close()
+            del self.file
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+        if save:
+            self.instance.save()
+
+    def variant_url(self, width, extension):
+        return self.storage.url(
+            variant_name(self.name, variant_suffix(width, extension)))
+
+
+class VariantImageField(models.ImageField):
+    """ImageField that also saves the variants of a processed upload"""
+    attr_class = VariantImageFieldFile
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        variants = {}
+        if file and not file._committed:
+            variants = getattr(file.file, 'variants', {})
+        file = super().pre_save(model_instance, add)
+        for suffix, content in variants.items():
+            save_variant(file.storage, variant_name(file.name, suffix),
+                         content)
+        return file
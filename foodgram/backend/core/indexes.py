@@ -0,0 +1,112 @@
+import uuid
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from .utils import on_commit_once
+
+cache = ConnectionProxy(caches, 'persistent')
+
+CHANGES_LOOKBACK = 100
+MAX_CHANGES = 500
+
+
+class ChangeLog:
+    """Log of changed keys that lets worker indexes catch up in place.
+
+    Every committed change adds a row with an auto-increment id, and a
+    token in the shared cache is replaced, so idle workers do not query
+    the log. Ids are taken before commit and a transaction may commit
+    after a later one, so readers also look CHANGES_LOOKBACK ids back and
+    skip the rows they have seen. Applying a change twice is harmless.
+    """
+
+    def __init__(self, model, field, head_key, size=10_000):
+        self.model = model
+        self.field = field
+        self.head_key = head_key
+        self.size = size
+
+    def record(self, key):
+        """Log the key once the current transaction commits"""
+        on_commit_once(f'{self.head_key}:{key}', lambda: self.append(key))
+
+    def append(self, key):
+        change = self.model.objects.create(**{self.field: key})
+        if change.pk % self.size == 0:
+            self.model.objects.filter(pk__lte=change.pk - self.size).delete()
+        cache.set(self.head_key, uuid.uuid4().hex, None)
+
+    def snapshot(self):
+        """Last id and the ids a reader starting now has already seen"""
+        seen = set(self.model.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:CHANGES_LOOKBACK])
+        return max(seen, default=0), seen
+
+    def read(self, position):
+        """Rows around and after position, None when too far behind"""
+        limit = CHANGES_LOOKBACK + MAX_CHANGES
+        rows = list(self.model.objects.filter(
+            pk__gt=position - CHANGES_LOOKBACK
+        ).order_by('pk').values_list('pk', self.field)[:limit])
+        return None if len(rows) == limit else rows
+
+
+class WorkerIndex:
+    """In-process index shared by the requests of one worker.
+
+    The index is built lazily and rebuilt once the version stored in the
+    shared cache changes, so an invalidation in one worker reaches all.
+    With a change log, keys logged since the last visit are passed to
+    update(index, keys) instead, and only a worker that fell too far
+    behind the log builds the index again.
+    """
+
+    def __init__(self, version_key, build, changes=None, update=None):
+        self.version_key = version_key
+        self.build = build
+        self.changes = changes
+        self.update = update
+        self.index = None
+        self.version = None
+        self.head = None
+        self.position = 0
+        self.seen = set()
+
+    def get(self):
+        keys = [self.version_key]
+        if self.changes is not None:
+            keys.append(self.changes.head_key)
+        values = cache.get_many(keys)
+        version = values.get(self.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(self.version_key, version, None)
+        head = values.get(keys[-1])
+        if self.index is None or version != self.version:
+            self.rebuild(version, head)
+        elif self.changes is not None and head != self.head:
+            self.catch_up(head)
+        return self.index
+
+    def rebuild(self, version, head):
+        if self.changes is not None:
+            self.position, self.seen = self.changes.snapshot()
+        self.index = self.build()
+        self.version = version
+        self.head = head
+
+    def catch_up(self, head):
+        rows = self.changes.read(self.position)
+        if rows is None:
+            return self.rebuild(self.version, head)
+        keys = {key for pk, key in rows if pk not in self.seen}
+        if keys:
+            self.update(self.index, keys)
+        self.position = max([self.position, *(pk for pk, _ in rows)])
+        self.seen = {pk for pk in self.seen | {pk for pk, _ in rows}
+                     if pk > self.position - CHANGES_LOOKBACK}
+        self.head = head
+
+    def invalidate(self):
+        cache.delete(self.version_key)
@@ -0,0 +1,97 @@
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+LEADING = 15
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+ENCODING = 'cp1251'
+
+
+def _glyph_name(char):
+    """Adobe glyph name of a Russian letter"""
+    code = ord(char)
+    if char == 'Ё':
+        return 'afii10023'
+    if char == 'ё':
+        return 'afii10071'
+    if char == '№':
+        return 'afii61352'
+    if 'А' <= char <= 'Е':
+        return f'afii{code - 0x410 + 10017}'
+    if 'Ж' <= char <= 'Я':
+        return f'afii{code - 0x416 + 10024}'
+    if 'а' <= char <= 'е':
+        return f'afii{code - 0x430 + 10065}'
+    if 'ж' <= char <= 'я':
+        return f'afii{code - 0x436 + 10072}'
+    return None
+
+
+def _glyph_differences():
+    """Map cp1251 codes to glyph names so Cyrillic survives Helvetica"""
+    differences = []
+    for code in range(128, 256):
+        try:
+            name = _glyph_name(bytes([code]).decode(ENCODING))
+        except UnicodeDecodeError:
+            name = None
+        if name:
+            differences.append(f'{code} /{name}')
+    return '[' + ' '.join(differences) + ']'
+
+
+def _escape(line):
+    text = line.encode(ENCODING, errors='replace')
+    return (text.replace(b'\\', b'\\\\')
+                .replace(b'(', b'\\(')
+                .replace(b')', b'\\)'))
+
+
+def _page_stream(lines):
+    stream = [b'BT', f'/F1 {FONT_SIZE} Tf {LEADING} TL'.encode(),
+              f'{MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode()]
+    for line in lines:
+        stream.append(b'(' + _escape(line) + b') Tj T*')
+    stream.append(b'ET')
+    return b'\n'.join(stream)
+
+
+def text_to_pdf(lines):
+    """Render plain text lines into a minimal multi-page PDF document"""
+    lines = [line.rstrip('\n') for line in lines] or ['']
+    pages = [lines[i:i + LINES_PER_PAGE]
+             for i in range(0, len(lines), LINES_PER_PAGE)]
+    first_page_id = 4
+    kids = ' '.join(f'{first_page_id + 2 * i} 0 R'
+                    for i in range(len(pages)))
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'.encode(),
+        (f'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+         f'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+         f'/Differences {_glyph_differences()} >> >>').encode(),
+    ]
+    for index, page in enumerate(pages):
+        content_id = first_page_id + 2 * index + 1
+        objects.append(
+            (f'<< /Type /Page /Parent 2 0 R '
+             f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+             f'/Resources << /Font << /F1 3 0 R >> >> '
+             f'/Contents {content_id} 0 R >>').encode())
+        stream = _page_stream(page)
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n'.encode()
+                       + stream + b'\nendstream')
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref_offset = len(output)
+    output += f'xref\n0 {len(objects) + 1}\n'.encode()
+    output += b'0000000000 65535 f \n'
+    for offset in offsets:
+        output += f'{offset:010d} 00000 n \n'.encode()
+    output += (f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n'
+               f'startxref\n{xref_offset}\n%%EOF\n').encode()
+    return bytes(output)
@@ -0,0 +1,52 @@
+import os
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+
+def spool_path(name):
+    return os.path.join(settings.SPOOL_ROOT, name)
+
+
+def is_spooled(name):
+    return os.path.isfile(spool_path(name))
+
+
+def write_spool(name, chunks, keep=None):
+    """Write generated chunks to the spool directory atomically.
+
+    When keep is given, files of the same directory whose names do not
+    start with it, such as exports of an older cart version, are removed.
+    """
+    path = spool_path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    temporary = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temporary, 'wb') as file:
+        for chunk in chunks:
+            file.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    os.replace(temporary, path)
+    if keep is not None:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not (entry.name.startswith(keep)
+                        or entry.name.endswith('.tmp')):
+                    os.remove(entry.path)
+
+
+def spooled_response(name, content_type, filename):
+    """Hand a spooled file to nginx with X-Accel-Redirect.
+
+    Without the gateway, e.g. under runserver, the file is streamed by
+    Django instead.
+    """
+    if settings.USE_X_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.SPOOL_URL + name)
+    else:
+        response = FileResponse(open(spool_path(name), 'rb'),
+                                content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
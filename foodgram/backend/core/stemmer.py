@@ -0,0 +1,89 @@
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (('вшись', 'вши', 'в'),
+                     ('ывшись', 'ившись', 'ывши', 'ивши', 'ыв', 'ив'))
+ADJECTIVE = ('ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые',
+             'ое', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их',
+             'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'й', 'л', 'н'),
+        ('уйте', 'ейте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило',
+         'ыло', 'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй',
+         'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'))
+NOUN = ('иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие',
+        'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах',
+        'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь',
+        'ю', 'я')
+DERIVATIONAL = ('ость', 'ост')
+SUPERLATIVE = ('ейше', 'ейш')
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _region(word, start):
+    """Position after the first non-vowel following a vowel"""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip(word, start, endings):
+    """Remove the first of the endings found in word[start:]"""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            return word[:-len(ending)]
+    return None
+
+
+def _strip_grouped(word, start, groups):
+    """Endings of the first group must follow 'а' or 'я'"""
+    preceded, plain = groups
+    for ending in preceded:
+        position = len(word) - len(ending)
+        if (word.endswith(ending) and position - 1 >= start
+                and word[position - 1] in 'ая'):
+            return word[:position]
+    return _strip(word, start, plain)
+
+
+def stem(word):
+    """Russian Snowball stemmer"""
+    word = word.lower().replace('ё', 'е')
+    rv = next((index + 1 for index, char in enumerate(word)
+               if char in VOWELS), len(word))
+    r2 = _region(word, _region(word, 0))
+
+    stripped = _strip_grouped(word, rv, PERFECTIVE_GERUND)
+    if stripped is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stripped = _strip(word, rv, ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip_grouped(stripped, rv, PARTICIPLE) or stripped
+        else:
+            stripped = (_strip_grouped(word, rv, VERB)
+                        or _strip(word, rv, NOUN))
+    word = stripped or word
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    stripped = _strip(word, rv, SUPERLATIVE)
+    if stripped is not None:
+        word = stripped
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+    elif word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
+
+
+def stem_words(text):
+    """Stems of all words of the text in their original order"""
+    return [stem(word) for word in WORD_RE.findall(text)]
@@ -0,0 +1,58 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the SHA-256 of their content.
+
+    Identical uploads share one file, so the files must not be deleted
+    together with a model instance: unreferenced files are removed by the
+    collect_media_garbage command. A reused file is touched so that its
+    age protects it from a collection running at the same time. The name
+    of every upload is computed from its bytes; only files derived from a
+    stored one, such as image variants, are saved with save_derived.
+    """
+
+    def content_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1]
+        return os.path.join(
+            directory, content_hash(content) + extension.lower())
+
+    def reuse(self, name):
+        if self.exists(name):
+            os.utime(self.path(name))
+            return True
+        return False
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.reuse(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_derived(self, name, content):
+        """Save a file under a name derived from a stored file.
+
+        The content follows from the source file, so an existing file
+        with that name is reused instead of being replaced or renamed.
+        """
+        if self.reuse(name):
+            return name
+        return super().save(name, content)
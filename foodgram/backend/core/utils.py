@@ -1,21 +1,141 @@
 import base64
+import binascii
 import re
 import time
 import uuid
-from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from rest_framework import serializers
 
+from .images import (IMAGE_INVALID_ERROR, IMAGE_MAX_BYTES, IMAGE_SIZE_ERROR,
+                     IMAGE_VARIANT_FORMATS, IMAGE_WIDTHS, ImageUpload,
+                     run_in_pool)
+
 
 class Base64ImageField(serializers.ImageField):
+    """Image field that passes every upload through the image pipeline.
+
+    Accepts base64 data URIs as well as multipart files, both are checked
+    against the size and pixel limits and re-encoded with their variants.
+    """
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            filename = f"image_{int(time.time())}_{uuid.uuid4().hex[:8]}.{ext}"
-            data = ContentFile(base64.b64decode(imgstr), name=filename)
+            _, imgstr = data.split(';base64,')
+            check_image_size(len(imgstr) * 3 // 4)
+            try:
+                content = base64.b64decode(imgstr)
+            except binascii.Error:
+                raise serializers.ValidationError(IMAGE_INVALID_ERROR)
+            data = process_upload(content)
+        elif isinstance(data, UploadedFile):
+            check_image_size(data.size)
+            data = process_upload(data.read())
         return super().to_internal_value(data)
 
 
+def check_image_size(size):
+    if size > IMAGE_MAX_BYTES:
+        raise serializers.ValidationError(IMAGE_SIZE_ERROR.format(
+            size=IMAGE_MAX_BYTES // (1024 * 1024)))
+
+
+def process_upload(content):
+    try:
+        ext, content, variants = run_in_pool(content)
+    except ValueError as error:
+        raise serializers.ValidationError(str(error))
+    filename = f"image_{int(time.time())}_{uuid.uuid4().hex[:8]}.{ext}"
+    return ImageUpload(content, name=filename, variants=variants)
+
+
+class ImageVariantsField(serializers.Field):
+    """URLs of the down-scaled copies of an image, by width and format"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, file):
+        if not file:
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for width in IMAGE_WIDTHS:
+            urls[str(width)] = {}
+            for extension in IMAGE_VARIANT_FORMATS:
+                url = file.variant_url(width, extension)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[str(width)][extension] = url
+        return urls
+
+
 def has_cyrillic(text):
     """Cyrillic alphabet verification"""
     return bool(re.search('[а-яА-ЯёЁ]', text))
+
+
+def on_commit_once(key, func, using=None):
+    """transaction.on_commit that runs func once per key and atomic block.
+
+    Hooks are looked up in the pending on_commit list of the current
+    savepoint, which is emptied on commit and rollback, so a rolled back
+    block leaves nothing behind.
+    """
+    connection = transaction.get_connection(using)
+    savepoint_ids = set(connection.savepoint_ids)
+    if any(getattr(hook, 'once_key', None) == key and sids == savepoint_ids
+           for sids, hook, _ in connection.run_on_commit):
+        return
+
+    def hook():
+        func()
+    hook.once_key = key
+    transaction.on_commit(hook, using)
+
+
+def change_counter(model, pk, field, delta):
+    """Atomic increment or decrement of a stored counter"""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+class PartialSaveMixin:
+    """Keep columns maintained by queryset updates out of full saves.
+
+    A loaded instance holds the values read at load time, so a plain
+    save() of an existing row lists every field except derived_fields
+    and the fields that were never loaded.
+    """
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            skipped = {*self.derived_fields, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in skipped
+                and field.attname not in skipped]
+        super().save(*args, **kwargs)
+
+
+def track_counter(sender, model, field_name, counter):
+    """Keep model.counter equal to the number of sender rows pointing at it"""
+    def increment(sender, instance, created, **kwargs):
+        if created:
+            change_counter(model, getattr(instance, field_name), counter, 1)
+
+    def decrement(sender, instance, **kwargs):
+        change_counter(model, getattr(instance, field_name), counter, -1)
+
+    post_save.connect(increment, sender=sender, weak=False,
+                      dispatch_uid=f'{counter}_increment')
+    post_delete.connect(decrement, sender=sender, weak=False,
+                        dispatch_uid=f'{counter}_decrement')
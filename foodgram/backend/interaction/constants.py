@@ -0,0 +1,3 @@
+FEED_FANOUT_MAX_FOLLOWERS = 10_000
+FEED_BACKFILL_SIZE = 100
+FEED_BATCH_SIZE = 1000
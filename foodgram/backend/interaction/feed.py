@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from recipes.models import Recipe
+
+from . import constants as const
+from .models import FeedEntry, Followers
+
+User = get_user_model()
+
+
+def is_fanned_out(author_id):
+    """Recipes of authors with very many followers are merged on read"""
+    return User.objects.filter(
+        pk=author_id,
+        followers_count__lte=const.FEED_FANOUT_MAX_FOLLOWERS).exists()
+
+
+def fan_out_recipe(recipe_id, author_id):
+    """Push a new recipe into the timelines of the author's followers"""
+    if is_fanned_out(author_id):
+        write_to_followers(author_id, [recipe_id])
+
+
+def write_to_followers(author_id, recipe_ids):
+    """Add the recipes to the timeline of every follower in batches"""
+    follower_ids = Followers.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator(chunk_size=const.FEED_BATCH_SIZE):
+        batch.extend(FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                               author_id=author_id)
+                     for recipe_id in recipe_ids)
+        if len(batch) >= const.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_timeline(user_id, author_id):
+    """Copy the latest recipes of a newly followed author.
+
+    Authors merged on read are copied too, so the timeline is complete
+    once they drop to the fan-out threshold again.
+    """
+    recipe_ids = Recipe.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True)[:const.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe_id, author_id=author_id)
+         for recipe_id in recipe_ids], ignore_conflicts=True)
+
+
+def crossed_to_fan_out(author_id):
+    """The author's follower count has just dropped to the threshold"""
+    return User.objects.filter(
+        pk=author_id,
+        followers_count=const.FEED_FANOUT_MAX_FOLLOWERS).exists()
+
+
+def catch_up_timelines(author_id):
+    """Fan out recipes published while the author was merged on read.
+
+    Such recipes have no timeline entries at all, so without this they
+    would vanish from the feeds once the author is fanned out again.
+    """
+    recipe_ids = list(Recipe.objects.filter(author_id=author_id).order_by(
+        '-id').values_list('id', flat=True)[:const.FEED_BACKFILL_SIZE])
+    fanned_out = set(FeedEntry.objects.filter(
+        recipe_id__in=recipe_ids).values_list('recipe_id', flat=True))
+    missing = [pk for pk in recipe_ids if pk not in fanned_out]
+    if missing:
+        write_to_followers(author_id, missing)
+
+
+def drop_from_timeline(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_recipes(user):
+    """Recipes of the user's timeline merged with followed big authors"""
+    timeline = Q(pk__in=FeedEntry.objects.filter(
+        user=user).values('recipe_id'))
+    merged_authors = list(Followers.objects.filter(
+        user=user,
+        author__followers_count__gt=const.FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('author_id', flat=True))
+    if merged_authors:
+        timeline |= Q(author_id__in=merged_authors)
+    return Recipe.objects.filter(timeline)
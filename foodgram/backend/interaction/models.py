@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -14,6 +15,9 @@ class Favorites(models.Model):
                              on_delete=models.CASCADE,
                              related_name='favorite_recipes',
                              verbose_name='Автор')
+    created = models.DateTimeField(default=timezone.now,
+                                   editable=False,
+                                   verbose_name='Добавлено')
 
     class Meta:
         verbose_name = 'Избранное'
@@ -59,6 +63,9 @@ class ShoppingCart(models.Model):
                                on_delete=models.CASCADE,
                                related_name='in_shopping_cart',
                                verbose_name=('Рецепт'))
+    created = models.DateTimeField(default=timezone.now,
+                                   editable=False,
+                                   verbose_name='Добавлено')
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -67,3 +74,28 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.recipe}"
+
+
+class FeedEntry(models.Model):
+    """Recipe pushed into a follower's timeline when it was published"""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed_entries',
+                             verbose_name='Подписчик')
+    recipe = models.ForeignKey('recipes.Recipe',
+                               on_delete=models.CASCADE,
+                               related_name='feed_entries',
+                               verbose_name='Рецепт')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        unique_together = ['user', 'recipe']
+        indexes = [models.Index(fields=['user', '-recipe'])]
+
+    def __str__(self):
+        return f"{self.user} - {self.recipe}"
@@ -0,0 +1,63 @@
+from core.utils import track_counter
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes import constants as recipes_const
+from recipes.models import Recipe
+from recipes.trending import change_trending_score
+
+from .feed import (backfill_timeline, catch_up_timelines, crossed_to_fan_out,
+                   drop_from_timeline, fan_out_recipe)
+from .models import Favorites, Followers, ShoppingCart
+
+User = get_user_model()
+
+track_counter(Favorites, Recipe, 'recipe_id', 'favorites_count')
+track_counter(ShoppingCart, Recipe, 'recipe_id', 'shopping_cart_count')
+track_counter(Followers, User, 'author_id', 'followers_count')
+
+TRENDING_WEIGHTS = {
+    Favorites: recipes_const.TRENDING_FAVORITE_WEIGHT,
+    ShoppingCart: recipes_const.TRENDING_SHOPPING_CART_WEIGHT,
+}
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+def add_trending_score(sender, instance, created, **kwargs):
+    """ Add the decayed weight of a new favorite or cart item """
+    if created:
+        change_trending_score(instance.recipe_id, instance.created,
+                              TRENDING_WEIGHTS[sender])
+
+
+@receiver(post_delete, sender=Favorites)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_trending_score(sender, instance, **kwargs):
+    """ Take back the weight the removed row added """
+    change_trending_score(instance.recipe_id, instance.created,
+                          -TRENDING_WEIGHTS[sender])
+
+
+@receiver(post_save, sender=Recipe)
+def push_to_timelines(sender, instance, created, **kwargs):
+    """ Fan a new recipe out to followers once it is committed """
+    if created:
+        transaction.on_commit(
+            lambda: fan_out_recipe(instance.id, instance.author_id))
+
+
+@receiver(post_save, sender=Followers)
+def backfill_follower_timeline(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Followers)
+def clear_follower_timeline(sender, instance, **kwargs):
+    """ Catch up timelines if the author dropped to the threshold """
+    drop_from_timeline(instance.user_id, instance.author_id)
+    if crossed_to_fan_out(instance.author_id):
+        transaction.on_commit(
+            lambda: catch_up_timelines(instance.author_id))
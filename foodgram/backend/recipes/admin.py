@@ -1,6 +1,6 @@
 from django.contrib import admin
-from django.db.models import Count
 from .models import Ingredient, MeasurementUnit, Recipe, RecipeIngredient, Tag
+from .search import search_recipes
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -15,11 +15,11 @@ class RecipeIngredientInline(admin.TabularInline):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'name', 'author', 'cooking_time',
-        'get_favorite_count', 'get_tags',)
+        'favorites_count', 'get_tags',)
     list_filter = ('tags', 'author')
-    search_fields = ('name', 'author__username', 'author__email')
+    search_fields = ('author__username', 'author__email')
     filter_horizontal = ('tags',)
-    readonly_fields = ('get_favorite_count',)
+    readonly_fields = ('favorites_count',)
     inlines = [RecipeIngredientInline]
 
     fieldsets = (
@@ -35,14 +35,16 @@ class RecipeAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
     def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            favorite_count=Count('in_favorites')
-        ).prefetch_related('tags')
+        return super().get_queryset(request).prefetch_related('tags')
 
-    def get_favorite_count(self, obj):
-        return obj.favorite_count
-    get_favorite_count.short_description = 'В избранном'
-    get_favorite_count.admin_order_field = 'favorite_count'
+    def get_search_results(self, request, queryset, search_term):
+        """ Full-text search by name and text or author lookups """
+        found, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term)
+        if search_term:
+            found |= queryset.filter(pk__in=search_recipes(
+                Recipe.objects.all(), search_term).values('pk'))
+        return found, may_have_duplicates
 
     def get_tags(self, obj):
         return ", ".join([tag.name for tag in obj.tags.all()])
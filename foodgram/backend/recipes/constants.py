@@ -8,3 +8,12 @@ MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 1440
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32_767
+TRENDING_HALF_LIFE_DAYS = 7
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_SHOPPING_CART_WEIGHT = 0.5
+TRENDING_EPOCH_MAX_AGE_DAYS = 10 * TRENDING_HALF_LIFE_DAYS
+SEARCH_CONFIG = 'russian'
+SEARCH_NAME_WEIGHT = 10.0
+SEARCH_TEXT_WEIGHT = 1.0
+SHORT_ID_PREFIX = '0'
+SHORT_LINK_CACHE_SIZE = 10_000
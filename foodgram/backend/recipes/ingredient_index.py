@@ -0,0 +1,129 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+
+from core.indexes import WorkerIndex
+from core.utils import has_cyrillic
+from transliterate import translit
+
+from .models import Ingredient
+
+FUZZY_LIMIT = 10
+FUZZY_MIN_SIMILARITY = 0.5
+FUZZY_MAX_POSTINGS = 500
+
+
+def normalize(text):
+    """Case-insensitive search key, 'ё' is searched as 'е'"""
+    return text.casefold().replace('ё', 'е').replace('\n', ' ').strip()
+
+
+def trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """Sorted in-memory index of ingredient names.
+
+    Prefix lookups are two binary searches over the sorted keys; substring
+    lookups scan a single joined string with str.find; typos are handled
+    by a trigram index.
+    """
+
+    def __init__(self, ingredients):
+        items = sorted(
+            ({'id': ingredient.id,
+              'name': ingredient.name,
+              'measurement_unit': ingredient.measurement_unit.name}
+             for ingredient in ingredients),
+            key=lambda item: (normalize(item['name']), item['id']))
+        self.items = items
+        self.keys = [normalize(item['name']) for item in items]
+        self.text = '\n'.join(self.keys)
+        self.offsets = array('l')
+        offset = 0
+        for key in self.keys:
+            self.offsets.append(offset)
+            offset += len(key) + 1
+        postings = defaultdict(lambda: array('l'))
+        self.trigram_counts = array('l')
+        for index, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                postings[gram].append(index)
+        self.postings = dict(postings)
+
+    def prefix_range(self, query):
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\U0010ffff', start)
+        return start, end
+
+    def substring_positions(self, query, exclude):
+        start, end = exclude
+        position = self.text.find(query)
+        while position != -1:
+            index = bisect_right(self.offsets, position) - 1
+            if not start <= index < end:
+                yield index
+            if index + 1 == len(self.offsets):
+                break
+            position = self.text.find(query, self.offsets[index + 1])
+
+    def search(self, query, substring=True):
+        """Prefix matches first, then names containing the query"""
+        query = normalize(query)
+        if not query:
+            return list(self.items)
+        start, end = self.prefix_range(query)
+        result = self.items[start:end]
+        if substring:
+            result.extend(self.items[index] for index in
+                          self.substring_positions(query, (start, end)))
+        return result
+
+    def fuzzy_search(self, query, limit=FUZZY_LIMIT):
+        """Top matches by trigram similarity, tolerant to typos.
+
+        Names are ranked by the share of query trigrams they contain, as
+        the user usually types the beginning of a longer name, and then by
+        the Jaccard similarity of the whole name. Trigrams with very long
+        posting lists carry little signal and are skipped, which keeps the
+        cost of a lookup bounded.
+        """
+        grams = trigrams(normalize(query))
+        shared = Counter()
+        for gram in grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) <= FUZZY_MAX_POSTINGS:
+                shared.update(posting)
+        best = heapq.nlargest(limit, (
+            (count / len(grams),
+             count / (len(grams) + self.trigram_counts[index] - count),
+             -index)
+            for index, count in shared.items()
+            if count / len(grams) >= FUZZY_MIN_SIMILARITY))
+        return [self.items[-index] for _, _, index in best]
+
+    def lookup(self, query):
+        """Exact search, then transliterated Latin input, then fuzzy"""
+        queries = [query]
+        if not has_cyrillic(query):
+            queries.append(translit(query, 'ru'))
+        for text in queries:
+            result = self.search(text)
+            if result:
+                return result
+        for text in reversed(queries):
+            result = self.fuzzy_search(text)
+            if result:
+                return result
+        return []
+
+
+ingredient_index = WorkerIndex(
+    'ingredient_index_version',
+    lambda: IngredientIndex(
+        Ingredient.objects.select_related('measurement_unit')))
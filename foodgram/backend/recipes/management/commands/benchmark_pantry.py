@@ -0,0 +1,50 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.recipe_index import RecipeIngredientIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark pantry ranking on a synthetic in-memory catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--ingredients', type=int, default=2_200)
+        parser.add_argument('--per-recipe', type=int, default=10)
+        parser.add_argument('--pantry', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredients = range(1, options['ingredients'] + 1)
+        # Popular ingredients are used far more often, as in real recipes.
+        weights = [1 / pk for pk in ingredients]
+        rows = sorted(
+            (ingredient_id, recipe_id)
+            for recipe_id in range(1, options['recipes'] + 1)
+            for ingredient_id in set(rng.choices(
+                ingredients, weights, k=options['per_recipe'])))
+
+        start = time.perf_counter()
+        index = RecipeIngredientIndex(rows)
+        build = time.perf_counter() - start
+
+        timings = []
+        for _ in range(options['queries']):
+            pantry = rng.choices(ingredients, weights, k=options['pantry'])
+            start = time.perf_counter()
+            ranking = index.rank_by_pantry(pantry)
+            ranking[0:options['page_size']]
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.stdout.write(
+            f'{options["recipes"]} recipes, {len(rows)} rows, '
+            f'index built in {build * 1000:.0f} ms\n'
+            f'top {options["page_size"]} of rank_by_pantry '
+            f'over {options["queries"]} pantries: '
+            f'median {timings[len(timings) // 2] * 1000:.1f} ms, '
+            f'max {timings[-1] * 1000:.1f} ms, '
+            f'last matched {len(ranking)} recipes')
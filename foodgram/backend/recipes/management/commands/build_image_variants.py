@@ -0,0 +1,42 @@
+from core.images import (get_pool, process_image, save_variant,
+                         variant_name, variant_names)
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+User = get_user_model()
+
+BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = 'Build down-scaled variants of images uploaded before them'
+
+    def handle(self, *args, **options):
+        names = [
+            name for name in (
+                *Recipe.objects.exclude(image='').values_list(
+                    'image', flat=True),
+                *User.objects.exclude(avatar='').exclude(
+                    avatar__isnull=True).values_list('avatar', flat=True))
+            if default_storage.exists(name)
+            and not default_storage.exists(variant_names(name)[0])]
+        built = 0
+        for start in range(0, len(names), BATCH_SIZE):
+            futures = {}
+            for name in names[start:start + BATCH_SIZE]:
+                with default_storage.open(name) as file:
+                    futures[name] = get_pool().submit(process_image,
+                                                      file.read())
+            for name, future in futures.items():
+                try:
+                    _, _, variants = future.result()
+                except ValueError as error:
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                for suffix, content in variants.items():
+                    save_variant(default_storage, variant_name(name, suffix),
+                                 content)
+                built += 1
+        self.stdout.write(f'Variants built for {built} images')
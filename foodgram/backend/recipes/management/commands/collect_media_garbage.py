@@ -0,0 +1,76 @@
+import os
+import time
+
+from core.images import variant_source_root
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+User = get_user_model()
+
+FIELDS = ((Recipe, 'image'), (User, 'avatar'))
+
+
+def walk(directory):
+    """Stream (name, mtime) of the files below a media directory"""
+    with os.scandir(os.path.join(settings.MEDIA_ROOT, directory)) as entries:
+        for entry in entries:
+            name = f'{directory}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.stat().st_mtime
+
+
+class Command(BaseCommand):
+    help = ('Remove media files no longer referenced by recipe images '
+            'or user avatars')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the files to remove')
+        parser.add_argument('--min-age', type=int, default=60 * 60,
+                            help='Keep files changed in the last N seconds')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        referenced = set()
+        roots = set()
+        directories = set()
+        for model, field_name in FIELDS:
+            directories.add(
+                model._meta.get_field(field_name).upload_to.strip('/'))
+            names = model.objects.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            ).values_list(field_name, flat=True)
+            for name in names.iterator(chunk_size=options['batch_size']):
+                referenced.add(name)
+                roots.add(os.path.splitext(name)[0])
+        cutoff = time.time() - options['min_age']
+        removed = 0
+        batch = []
+        for directory in directories:
+            if not os.path.isdir(os.path.join(settings.MEDIA_ROOT,
+                                              directory)):
+                continue
+            for name, mtime in walk(directory):
+                if (mtime > cutoff or name in referenced
+                        or variant_source_root(name) in roots):
+                    continue
+                batch.append(name)
+                if len(batch) == options['batch_size']:
+                    removed += self.remove(batch, options['dry_run'])
+                    batch = []
+        removed += self.remove(batch, options['dry_run'])
+        self.stdout.write(f'{removed} unreferenced files '
+                          f'{"found" if options["dry_run"] else "removed"}')
+
+    def remove(self, names, dry_run):
+        for name in names:
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+        return len(names)
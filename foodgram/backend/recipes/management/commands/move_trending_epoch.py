@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.trending import move_trending_epoch
+
+
+class Command(BaseCommand):
+    help = ('Move the trending epoch forward once it is due and rescale '
+            'the stored scores, run it daily')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        epoch = move_trending_epoch(now)
+        self.stdout.write(f'Trending epoch: {epoch.isoformat()}'
+                          f'{" (moved)" if epoch == now else ""}')
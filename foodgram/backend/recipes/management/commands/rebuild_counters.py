@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from interaction.models import Favorites, Followers, ShoppingCart
+from interaction.signals import TRENDING_WEIGHTS
+from recipes.models import Recipe
+from recipes.trending import move_trending_epoch, trending_weight
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorites, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Followers, 'author'),
+)
+
+
+def actual_count(source, field_name):
+    return Coalesce(Subquery(
+        source.objects.filter(**{field_name: OuterRef('pk')}).order_by()
+        .values(field_name).annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+class Command(BaseCommand):
+    help = ('Rebuild stored favorite, cart, recipe and follower counters '
+            'and trending scores')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report counters that drifted')
+
+    def handle(self, *args, **options):
+        for model, counter, source, field_name in COUNTERS:
+            with transaction.atomic():
+                stale = model.objects.annotate(
+                    actual=actual_count(source, field_name)
+                ).filter(~Q(**{counter: F('actual')}))
+                drift = stale.count()
+                if drift and not options['dry_run']:
+                    model.objects.filter(pk__in=stale.values('pk')).update(
+                        **{counter: actual_count(source, field_name)})
+            self.stdout.write(
+                f'{model._meta.label}.{counter}: {drift} drifted')
+        if not options['dry_run']:
+            self.rebuild_trending_scores()
+
+    def rebuild_trending_scores(self):
+        """Recompute the scores, moving the epoch first if it is due"""
+        scores = {}
+        with transaction.atomic():
+            epoch = move_trending_epoch(timezone.now(), rescale=False)
+            for source, weight in TRENDING_WEIGHTS.items():
+                rows = source.objects.values_list('recipe_id', 'created')
+                for recipe_id, created in rows.iterator(
+                        chunk_size=BATCH_SIZE):
+                    scores[recipe_id] = (
+                        scores.get(recipe_id, 0)
+                        + trending_weight(created, weight, epoch))
+            Recipe.objects.exclude(pk__in=scores).update(trending_score=0)
+            Recipe.objects.bulk_update(
+                [Recipe(pk=pk, trending_score=score)
+                 for pk, score in scores.items()],
+                ['trending_score'], batch_size=BATCH_SIZE)
+        self.stdout.write(f'Trending scores rebuilt for {len(scores)} recipes')
@@ -0,0 +1,26 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe, RecipeIngredient
+from recipes.similarity import BATCH_SIZE, minhash, similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild MinHash signatures used to find similar recipes'
+
+    def handle(self, *args, **options):
+        ingredients = defaultdict(list)
+        rows = RecipeIngredient.objects.values_list(
+            'recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=BATCH_SIZE):
+            ingredients[recipe_id].append(ingredient_id)
+        with transaction.atomic():
+            Recipe.objects.exclude(pk__in=ingredients).update(minhash=b'')
+            Recipe.objects.bulk_update(
+                [Recipe(pk=pk, minhash=minhash(ingredient_ids))
+                 for pk, ingredient_ids in ingredients.items()],
+                ['minhash'], batch_size=1000)
+            transaction.on_commit(similarity_index.invalidate)
+        self.stdout.write(
+            f'Signatures rebuilt for {len(ingredients)} recipes')
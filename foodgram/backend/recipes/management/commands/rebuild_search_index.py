@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe
+from recipes.search import create_search_table, index_recipes
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild full-text search documents of all recipes'
+
+    def handle(self, *args, **options):
+        create_search_table()
+        batch = []
+        count = 0
+        recipes = Recipe.objects.only('id', 'name', 'text').order_by()
+        with transaction.atomic():
+            for recipe in recipes.iterator(chunk_size=BATCH_SIZE):
+                batch.append(recipe)
+                if len(batch) == BATCH_SIZE:
+                    index_recipes(batch)
+                    count += len(batch)
+                    batch = []
+            index_recipes(batch)
+            count += len(batch)
+        self.stdout.write(f'Search documents rebuilt for {count} recipes')
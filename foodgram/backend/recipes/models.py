@@ -1,14 +1,40 @@
 from backend.settings import DNS_SERVER_NAME
+from core.images import VariantImageField
+from core.utils import PartialSaveMixin
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import Exists, OuterRef, Prefetch
 
 from . import constants as const
 
 User = get_user_model()
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Load author, tags and ingredients with units in fixed queries"""
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch('ingredient_amounts',
+                     queryset=RecipeIngredient.objects.select_related(
+                         'ingredient__measurement_unit')))
+
+    def with_user_flags(self, user):
+        """Annotate is_favorited/is_in_shopping_cart for the given user"""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=Exists(user.favorite_recipes.filter(
+                recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(user.shopping_cart.filter(
+                recipe=OuterRef('pk'))))
+
+
+class Recipe(PartialSaveMixin, models.Model):
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='recipes',
@@ -24,22 +50,46 @@ class Recipe(models.Model):
                                          verbose_name='Ингредиенты')
     name = models.CharField(max_length=const.MAX_LENGTH_NAME,
                             verbose_name='Название')
-    image = models.ImageField(upload_to='food_pictures/',
+    image = VariantImageField(upload_to='food_pictures/',
                               blank=True,
                               verbose_name='Изображение')
     short_id = models.CharField(max_length=10,
                                 unique=True,
                                 blank=True,
+                                null=True,
                                 verbose_name='Короткий ID')
     tags = models.ManyToManyField('Tag',
                                   related_name='recipes',
                                   verbose_name='Тег')
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='В избранном')
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок')
+    trending_score = models.FloatField(
+        default=0,
+        editable=False,
+        db_index=True,
+        verbose_name='Популярность за последнее время')
+    minhash = models.BinaryField(default=b'',
+                                 editable=False,
+                                 verbose_name='MinHash ингредиентов')
+
+    objects = RecipeQuerySet.as_manager()
+
+    derived_fields = ('favorites_count', 'shopping_cart_count',
+                      'trending_score', 'minhash', 'short_id')
 
     @property
     def short_link(self):
         return f"http://{DNS_SERVER_NAME}:8000/s/{self.short_id}/"
 
     class Meta:
+        ordering = ('-id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -115,3 +165,37 @@ class RecipeIngredient(models.Model):
 
     def __str__(self):
         return f"{self.ingredient} - {self.amount}"
+
+
+class RecipeSearch(models.Model):
+    """Full-text document of a recipe, only created on PostgreSQL"""
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.DO_NOTHING,
+                                  primary_key=True,
+                                  related_name='search_document',
+                                  verbose_name='Рецепт')
+    document = SearchVectorField(verbose_name='Поисковый документ')
+
+    class Meta:
+        required_db_vendor = 'postgresql'
+        indexes = [GinIndex(fields=['document'])]
+        verbose_name = 'Поисковый документ рецепта'
+        verbose_name_plural = 'Поисковые документы рецептов'
+
+
+class RecipeChange(models.Model):
+    """Recipe whose ingredients changed, read by the worker indexes"""
+    recipe_id = models.PositiveBigIntegerField(verbose_name='ID рецепта')
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+
+class TrendingEpoch(models.Model):
+    """Reference time the stored trending scores are measured from"""
+    epoch = models.DateTimeField(verbose_name='Начало отсчёта')
+
+    class Meta:
+        verbose_name = 'Начало отсчёта популярности'
+        verbose_name_plural = 'Начало отсчёта популярности'
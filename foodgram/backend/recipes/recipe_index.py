@@ -0,0 +1,114 @@
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from core.indexes import ChangeLog, WorkerIndex
+
+from .models import RecipeChange, RecipeIngredient
+
+BATCH_SIZE = 10_000
+
+
+class RecipeIngredientIndex:
+    """Inverted index: ingredient id -> sorted array of recipe ids"""
+
+    def __init__(self, rows):
+        postings = defaultdict(lambda: array('l'))
+        self.sizes = Counter()
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            self.sizes[recipe_id] += 1
+        self.postings = dict(postings)
+
+    def apply(self, recipe_ids, rows):
+        """Replace the postings of the recipes with their current rows.
+
+        The old ingredients of a recipe are not stored, so the postings
+        are searched with bisect until all of them are found.
+        """
+        remaining = {pk: self.sizes.pop(pk, 0) for pk in recipe_ids}
+        remaining = {pk: count for pk, count in remaining.items() if count}
+        for posting in self.postings.values():
+            if not remaining:
+                break
+            for recipe_id in list(remaining):
+                index = bisect_left(posting, recipe_id)
+                if index < len(posting) and posting[index] == recipe_id:
+                    del posting[index]
+                    remaining[recipe_id] -= 1
+                    if not remaining[recipe_id]:
+                        del remaining[recipe_id]
+        for ingredient_id, recipe_id in rows:
+            insort(self.postings.setdefault(ingredient_id, array('l')),
+                   recipe_id)
+            self.sizes[recipe_id] += 1
+
+    def recipes_with_all(self, ingredient_ids):
+        """Ids of recipes containing every given ingredient"""
+        postings = sorted((self.postings.get(pk, array('l'))
+                           for pk in set(ingredient_ids)), key=len)
+        if not postings:
+            return set()
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(posting)
+        return result
+
+    def recipes_with_any(self, ingredient_ids):
+        """Ids of recipes containing at least one given ingredient"""
+        result = set()
+        for pk in set(ingredient_ids):
+            result.update(self.postings.get(pk, ()))
+        return result
+
+    def rank_by_pantry(self, ingredient_ids):
+        """Recipes sharing ingredients with the pantry, see PantryRanking"""
+        matches = Counter()
+        for pk in set(ingredient_ids):
+            matches.update(self.postings.get(pk, ()))
+        return PantryRanking(matches, self.sizes)
+
+
+class PantryRanking:
+    """Recipes ranked by the share of their ingredients in the pantry.
+
+    Only the posting lists of the pantry ingredients are read, so the cost
+    depends on how many recipes use them, not on the table size. Slicing
+    selects just the requested top of the ranking, which is how the
+    paginator reads it. Items are (recipe_id, covered share) pairs; ties
+    go to the recipe with fewer missing ingredients, then to the newer one.
+    """
+
+    def __init__(self, matches, sizes):
+        self.matches = matches
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.matches)
+
+    def __getitem__(self, page):
+        top = heapq.nlargest(page.stop or len(self), (
+            (have / self.sizes[recipe_id], have - self.sizes[recipe_id],
+             recipe_id) for recipe_id, have in self.matches.items()))
+        return [(recipe_id, coverage)
+                for coverage, _, recipe_id in top[page]]
+
+
+def build_recipe_index():
+    return RecipeIngredientIndex(
+        RecipeIngredient.objects.order_by('ingredient_id', 'recipe_id')
+        .values_list('ingredient_id', 'recipe_id')
+        .iterator(chunk_size=BATCH_SIZE))
+
+
+def update_recipe_index(index, recipe_ids):
+    index.apply(recipe_ids, RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids).values_list('ingredient_id', 'recipe_id'))
+
+
+recipe_changes = ChangeLog(RecipeChange, 'recipe_id', 'recipe_changes_head')
+recipe_index = WorkerIndex('recipe_index_version', build_recipe_index,
+                           recipe_changes, update_recipe_index)
@@ -0,0 +1,85 @@
+from core.stemmer import stem_words
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from . import constants as const
+from .models import Recipe, RecipeSearch
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_search_table(using=DEFAULT_DB_ALIAS):
+    """FTS5 table for SQLite, PostgreSQL uses the RecipeSearch model"""
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                           f'USING fts5(name, text)')
+
+
+def index_recipes(recipes, using=DEFAULT_DB_ALIAS):
+    """Write search documents of the recipes, replacing the old ones"""
+    connection = connections[using]
+    recipes = [(recipe.id, recipe.name, recipe.text) for recipe in recipes]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.executemany(
+                f'INSERT INTO {RecipeSearch._meta.db_table} '
+                f'(recipe_id, document) VALUES (%s, '
+                f"setweight(to_tsvector('{const.SEARCH_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{const.SEARCH_CONFIG}', %s), 'B')) "
+                f'ON CONFLICT (recipe_id) '
+                f'DO UPDATE SET document = EXCLUDED.document', recipes)
+        elif connection.vendor == 'sqlite':
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                               [(pk,) for pk, _, _ in recipes])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                f'VALUES (%s, %s, %s)',
+                [(pk, ' '.join(stem_words(name)), ' '.join(stem_words(text)))
+                 for pk, name, text in recipes])
+
+
+def unindex_recipe(recipe_id, using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DELETE FROM {RecipeSearch._meta.db_table} '
+                           f'WHERE recipe_id = %s', [recipe_id])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [recipe_id])
+
+
+def search_recipes(queryset, query):
+    """Recipes matching the query, best matches first.
+
+    PostgreSQL matches the stored tsvector with the 'russian' config; on
+    SQLite the words are stemmed in Python and matched against FTS5, so
+    both backends find 'пироги' by 'пирогами'.
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        search_query = SearchQuery(query, config=const.SEARCH_CONFIG,
+                                   search_type='websearch')
+        return queryset.filter(
+            search_document__document=search_query
+        ).annotate(search_rank=SearchRank(
+            F('search_document__document'), search_query)
+        ).order_by('-search_rank', '-id')
+    terms = stem_words(query)
+    if vendor != 'sqlite' or not terms:
+        return queryset.none()
+    match = ' '.join(f'"{term}"' for term in terms)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,))
+    ).annotate(search_rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, {const.SEARCH_NAME_WEIGHT}, '
+        f'{const.SEARCH_TEXT_WEIGHT}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s '
+        f'AND rowid = {Recipe._meta.db_table}.id', (match,),
+        output_field=FloatField())
+    ).order_by('-search_rank', '-id')
@@ -0,0 +1,51 @@
+import string
+from functools import lru_cache
+
+from . import constants as const
+from .models import Recipe
+
+ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+BASE = len(ALPHABET)
+
+
+def encode_short_id(pk):
+    """Base-62 form of the primary key behind a prefix.
+
+    Random ids made before never contain '0', so the prefix keeps the
+    derived ids apart from them.
+    """
+    digits = []
+    while True:
+        pk, digit = divmod(pk, BASE)
+        digits.append(ALPHABET[digit])
+        if not pk:
+            break
+    return const.SHORT_ID_PREFIX + ''.join(reversed(digits))
+
+
+def decode_short_id(short_id):
+    """Primary key of a derived id, None for random ids made before"""
+    prefix = const.SHORT_ID_PREFIX
+    if not short_id.startswith(prefix) or len(short_id) == len(prefix):
+        return None
+    pk = 0
+    for char in short_id[len(prefix):]:
+        digit = ALPHABET.find(char)
+        if digit == -1:
+            return None
+        pk = pk * BASE + digit
+    return pk
+
+
+@lru_cache(maxsize=const.SHORT_LINK_CACHE_SIZE)
+def resolve_short_id(short_id):
+    """Recipe id of a short link.
+
+    Short ids never change, so resolved links stay in the process; a
+    missing recipe raises Recipe.DoesNotExist, which is not cached.
+    """
+    queryset = Recipe.objects.filter(short_id=short_id)
+    pk = decode_short_id(short_id)
+    if pk is not None:
+        queryset = queryset.filter(pk=pk)
+    return queryset.values_list('id', flat=True).get()
@@ -1,11 +1,17 @@
-import shortuuid
-from core.utils import has_cyrillic
-from django.db.models.signals import pre_save
+from core.utils import has_cyrillic, on_commit_once, track_counter
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
 from django.dispatch import receiver
 from django.utils.text import slugify
 from transliterate import translit
 
-from .models import Recipe, Tag
+from .ingredient_index import ingredient_index
+from .models import (Ingredient, MeasurementUnit, Recipe, RecipeIngredient,
+                     Tag, User)
+from .search import create_search_table, index_recipes, unindex_recipe
+from .short_links import encode_short_id, resolve_short_id
+from .similarity import refresh_minhash
 
 
 @receiver(pre_save, sender=Tag)
@@ -21,8 +27,53 @@ def generate_tag_slug(sender, instance, **kwargs):
             instance.slug = base_slug
 
 
-@receiver(pre_save, sender=Recipe)
-def generate_short_id(sender, instance, **kwargs):
-    """ Generate short is before save object """
-    if not instance.short_id:
-        instance.short_id = shortuuid.ShortUUID().random(length=5)
+@receiver(post_save, sender=Recipe)
+def generate_short_id(sender, instance, created, **kwargs):
+    """ Derive the short id from the primary key of a new recipe """
+    if created and not instance.short_id:
+        instance.short_id = encode_short_id(instance.pk)
+        sender.objects.filter(pk=instance.pk).update(
+            short_id=instance.short_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_short_link(sender, instance, **kwargs):
+    resolve_short_id.cache_clear()
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=MeasurementUnit)
+def reset_ingredient_index(sender, instance, **kwargs):
+    """ Rebuild ingredient search index after catalog changes """
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def refresh_recipe_indexes(sender, instance, **kwargs):
+    """ Refresh the signature and log the recipe for the worker indexes """
+    recipe_id = instance.recipe_id
+    on_commit_once(f'refresh_minhash:{recipe_id}',
+                   lambda: refresh_minhash(recipe_id))
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_document(sender, instance, using, update_fields=None,
+                           **kwargs):
+    """ Keep the full-text document in sync with name and text """
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        index_recipes([instance], using)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_search_document(sender, instance, using, **kwargs):
+    unindex_recipe(instance.id, using)
+
+
+@receiver(post_migrate)
+def create_recipe_search_table(sender, using, **kwargs):
+    """ Create the SQLite FTS5 table that migrations do not manage """
+    if sender.name == 'recipes':
+        create_search_table(using)
+
+
+track_counter(Recipe, User, 'author_id', 'recipes_count')
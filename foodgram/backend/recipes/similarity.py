@@ -0,0 +1,138 @@
+import heapq
+import random
+import struct
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from core.indexes import WorkerIndex
+
+from .models import Recipe, RecipeIngredient
+from .recipe_index import recipe_changes
+
+NUM_HASHES = 32
+BAND_ROWS = 2
+MAX_CANDIDATES = 200
+MAX_BUCKET_READ = 1000
+BATCH_SIZE = 10_000
+PRIME = 2 ** 31 - 1
+SIGNATURE_FORMAT = f'>{NUM_HASHES}I'
+
+_random = random.Random(NUM_HASHES)
+HASH_PARAMS = [(_random.randrange(1, PRIME), _random.randrange(PRIME))
+               for _ in range(NUM_HASHES)]
+
+
+def minhash(ingredient_ids):
+    """MinHash signature of an ingredient set packed into bytes"""
+    ingredient_ids = list(ingredient_ids)
+    if not ingredient_ids:
+        return b''
+    return struct.pack(SIGNATURE_FORMAT, *(
+        min((a * pk + b) % PRIME for pk in ingredient_ids)
+        for a, b in HASH_PARAMS))
+
+
+def band_keys(signature):
+    size = 4 * BAND_ROWS
+    return [hash((start, signature[start:start + size]))
+            for start in range(0, len(signature), size)]
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+class SimilarityIndex:
+    """Locality-sensitive hashing buckets over recipe MinHash signatures.
+
+    Recipes that share a band of their signature land in one bucket, so
+    candidates for a recipe are found without comparing it to every other.
+    Buckets are sorted arrays of recipe ids. Bands of very common
+    ingredients make huge buckets with little signal, so only the newest
+    MAX_BUCKET_READ recipes of a bucket are read, which keeps a lookup
+    bounded as the table grows.
+    """
+
+    def __init__(self, rows):
+        buckets = defaultdict(lambda: array('l'))
+        self.signatures = {}
+        for recipe_id, signature in rows:
+            signature = bytes(signature)
+            self.signatures[recipe_id] = signature
+            for key in band_keys(signature):
+                buckets[key].append(recipe_id)
+        self.buckets = dict(buckets)
+
+    def apply(self, recipe_ids, rows):
+        """Move the recipes to the buckets of their current signatures"""
+        for recipe_id in recipe_ids:
+            signature = self.signatures.pop(recipe_id, None)
+            if signature is None:
+                continue
+            for key in band_keys(signature):
+                bucket = self.buckets.get(key, ())
+                index = bisect_left(bucket, recipe_id)
+                if index < len(bucket) and bucket[index] == recipe_id:
+                    del bucket[index]
+                if not bucket:
+                    self.buckets.pop(key, None)
+        for recipe_id, signature in rows:
+            signature = bytes(signature)
+            self.signatures[recipe_id] = signature
+            for key in band_keys(signature):
+                insort(self.buckets.setdefault(key, array('l')), recipe_id)
+
+    def candidates(self, recipe_id, signature, limit=MAX_CANDIDATES):
+        """Recipes sharing the most signature bands with the given one"""
+        shared = Counter()
+        for key in band_keys(bytes(signature)):
+            shared.update(self.buckets.get(key, ())[-MAX_BUCKET_READ:])
+        shared.pop(recipe_id, None)
+        return [pk for pk, _ in shared.most_common(limit)]
+
+
+def signature_rows(queryset):
+    return queryset.exclude(minhash=b'').values_list('id', 'minhash')
+
+
+def build_similarity_index():
+    return SimilarityIndex(signature_rows(Recipe.objects.order_by('id'))
+                           .iterator(chunk_size=BATCH_SIZE))
+
+
+def update_similarity_index(index, recipe_ids):
+    index.apply(recipe_ids,
+                signature_rows(Recipe.objects.filter(pk__in=recipe_ids)))
+
+
+similarity_index = WorkerIndex('similarity_index_version',
+                               build_similarity_index,
+                               recipe_changes, update_similarity_index)
+
+
+def refresh_minhash(recipe_id, ingredient_ids=None):
+    """Store a new signature for the recipe after its ingredients change"""
+    if ingredient_ids is None:
+        ingredient_ids = RecipeIngredient.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', flat=True)
+    Recipe.objects.filter(pk=recipe_id).update(
+        minhash=minhash(ingredient_ids))
+    recipe_changes.record(recipe_id)
+
+
+def similar_recipes(recipe, limit):
+    """Top recipes by exact Jaccard similarity among the LSH candidates"""
+    candidates = similarity_index.get().candidates(recipe.id, recipe.minhash)
+    ingredients = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=[recipe.id, *candidates]
+    ).values_list('recipe_id', 'ingredient_id'):
+        ingredients[recipe_id].add(ingredient_id)
+    own = ingredients.pop(recipe.id, set())
+    if not own:
+        return []
+    return [(recipe_id, similarity) for similarity, recipe_id in
+            heapq.nlargest(limit, (
+                (jaccard(own, others), recipe_id)
+                for recipe_id, others in ingredients.items()))]
@@ -0,0 +1,324 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from interaction.models import Favorites
+from recipes.models import (Ingredient, MeasurementUnit, Recipe,
+                            RecipeIngredient, TrendingEpoch)
+from recipes.recipe_index import recipe_index
+from recipes.short_links import (decode_short_id, encode_short_id,
+                                 resolve_short_id)
+from recipes.similarity import refresh_minhash, similarity_index
+
+User = get_user_model()
+
+
+class CountersTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Текст', cooking_time=10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.reader)
+
+    def test_counters_follow_api_actions(self):
+        url = f'/api/recipes/{self.recipe.id}/'
+        self.client.post(url + 'favorite/')
+        self.client.post(url + 'shopping_cart/')
+        self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.recipe.shopping_cart_count, 1)
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
+        self.client.delete(url + 'favorite/')
+        self.client.delete(f'/api/users/{self.author.id}/subscribe/')
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_rebuild_counters(self):
+        Favorites.objects.bulk_create([
+            Favorites(user=self.reader, recipe=self.recipe)])
+        out = StringIO()
+        call_command('rebuild_counters', '--dry-run', stdout=out)
+        self.assertIn('recipes.Recipe.favorites_count: 1 drifted',
+                      out.getvalue())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        out = StringIO()
+        call_command('rebuild_counters', stdout=out)
+        self.assertNotIn(': 1 drifted', out.getvalue())
+
+    def test_popular_and_trending_ordering(self):
+        old, fresh = self.recipe, Recipe.objects.create(
+            author=self.author, name='Новый', text='Текст', cooking_time=5)
+        readers = [User.objects.create_user(
+            username=f'user{i}', email=f'user{i}@example.com',
+            first_name='Имя', last_name='Фамилия') for i in range(3)]
+        for reader in readers:
+            Favorites.objects.create(
+                user=reader, recipe=old,
+                created=timezone.now() - timedelta(days=60))
+        Favorites.objects.create(user=readers[0], recipe=fresh)
+
+        def ids(ordering):
+            response = self.client.get(f'/api/recipes/?ordering={ordering}')
+            return [recipe['id'] for recipe in response.json()['results']]
+
+        self.assertEqual(ids('popular'), [old.id, fresh.id])
+        self.assertEqual(ids('trending'), [fresh.id, old.id])
+        response = self.client.get('/api/recipes/?ordering=trending&cursor=')
+        self.assertEqual([recipe['id'] for recipe in response.json()[
+            'results']], [fresh.id, old.id])
+        scores = dict(Recipe.objects.values_list('pk', 'trending_score'))
+        call_command('rebuild_counters', stdout=StringIO())
+        rebuilt = dict(Recipe.objects.values_list('pk', 'trending_score'))
+        self.assertAlmostEqual(rebuilt[old.pk] / rebuilt[fresh.pk],
+                               scores[old.pk] / scores[fresh.pk])
+        self.assertLess(rebuilt[fresh.pk], 2)
+        self.assertEqual(ids('trending'), [fresh.id, old.id])
+
+    def test_trending_epoch_moves_forward(self):
+        now = timezone.now()
+        TrendingEpoch.objects.create(pk=1, epoch=now - timedelta(days=100))
+        Recipe.objects.filter(pk=self.recipe.pk).update(trending_score=1.0)
+        Favorites.objects.create(user=self.reader, recipe=self.recipe)
+        self.assertEqual(TrendingEpoch.objects.get(pk=1).epoch,
+                         now - timedelta(days=100))
+        call_command('move_trending_epoch', stdout=StringIO())
+        epoch = TrendingEpoch.objects.get(pk=1).epoch
+        self.assertGreater(epoch, now)
+        self.recipe.refresh_from_db()
+        self.assertAlmostEqual(self.recipe.trending_score, 1.0, places=3)
+        call_command('move_trending_epoch', stdout=StringIO())
+        self.assertEqual(TrendingEpoch.objects.get(pk=1).epoch, epoch)
+
+
+class IngredientFilterTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        unit = MeasurementUnit.objects.create(name='грамм', abbrev='г')
+        cls.chicken, cls.nuts, cls.rice = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name in ('Курица', 'Орехи', 'Рис'))
+        cls.recipes = {}
+        for name, ingredients in (
+                ('Курица с рисом', (cls.chicken, cls.rice)),
+                ('Курица с орехами', (cls.chicken, cls.nuts)),
+                ('Рис с орехами', (cls.rice, cls.nuts))):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='Текст', cooking_time=10)
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1)
+            cls.recipes[name] = recipe
+
+    def setUp(self):
+        caches['persistent'].clear()
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        return {recipe['name'] for recipe in response.json()['results']}
+
+    def test_include_and_exclude(self):
+        self.assertEqual(
+            self.names(f'ingredients={self.chicken.id}'
+                       f'&exclude_ingredients={self.nuts.id}'),
+            {'Курица с рисом'})
+        self.assertEqual(
+            self.names(f'ingredients={self.rice.id},{self.nuts.id}'),
+            {'Рис с орехами'})
+        self.assertEqual(self.names(f'exclude_ingredients={self.rice.id}'),
+                         {'Курица с орехами'})
+
+    def test_index_follows_recipe_changes(self):
+        self.assertEqual(self.names(f'ingredients={self.rice.id}'),
+                         {'Курица с рисом', 'Рис с орехами'})
+        with patch.object(recipe_index, 'build', side_effect=AssertionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                RecipeIngredient.objects.create(
+                    recipe=self.recipes['Курица с орехами'],
+                    ingredient=self.rice, amount=1)
+            self.assertEqual(len(self.names(f'ingredients={self.rice.id}')),
+                             3)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipes['Рис с орехами'].delete()
+            self.assertEqual(self.names(f'ingredients={self.rice.id}'),
+                             {'Курица с рисом', 'Курица с орехами'})
+
+    def test_pantry_ranking(self):
+        response = self.client.get(
+            f'/api/recipes/pantry/?ingredients={self.chicken.id},'
+            f'{self.rice.id}')
+        self.assertEqual(response.json()['count'], 3)
+        results = response.json()['results']
+        self.assertEqual(
+            [(recipe['name'], recipe['coverage']) for recipe in results],
+            [('Курица с рисом', 1.0), ('Рис с орехами', 0.5),
+             ('Курица с орехами', 0.5)])
+        self.assertEqual(results[0]['missing_ingredients'], [])
+        self.assertEqual(
+            [item['name'] for item in results[1]['missing_ingredients']],
+            ['Орехи'])
+        response = self.client.get('/api/recipes/pantry/?ingredients=x')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_similar_recipes(self):
+        recipe = Recipe.objects.create(
+            author=self.recipes['Рис с орехами'].author,
+            name='Курица с рисом и орехами', text='Текст', cooking_time=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            for ingredient in (self.chicken, self.rice, self.nuts):
+                RecipeIngredient.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1)
+        call_command('rebuild_minhash', stdout=StringIO())
+        response = self.client.get(
+            f'/api/recipes/{self.recipes["Курица с рисом"].id}/similar/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            (response.json()[0]['name'], response.json()[0]['similarity']),
+            ('Курица с рисом и орехами', 0.67))
+        self.assertEqual(self.client.get(
+            f'/api/recipes/{recipe.id}/similar/?limit=x'
+        ).status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_similarity_index_follows_recipe_changes(self):
+        call_command('rebuild_minhash', stdout=StringIO())
+        url = f'/api/recipes/{self.recipes["Курица с рисом"].id}/similar/'
+        self.client.get(url)
+        with patch.object(similarity_index, 'build',
+                          side_effect=AssertionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                RecipeIngredient.objects.filter(
+                    recipe=self.recipes['Рис с орехами'],
+                    ingredient=self.nuts).update(ingredient=self.chicken)
+                refresh_minhash(self.recipes['Рис с орехами'].id)
+            self.assertEqual(
+                (self.client.get(url).json()[0]['name'],
+                 self.client.get(url).json()[0]['similarity']),
+                ('Рис с орехами', 1.0))
+
+
+class RecipeSearchTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        for name, text in (('Пироги с капустой', 'Тесто и капуста'),
+                           ('Капустный салат', 'Нарезать капусту'),
+                           ('Блины', 'Подавать с пирогом')):
+            Recipe.objects.create(author=cls.author, name=name, text=text,
+                                  cooking_time=10)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def names(self, query):
+        response = self.client.get(f'/api/recipes/?search={query}')
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_search_stems_and_ranks(self):
+        self.assertEqual(self.names('пирогами'),
+                         ['Пироги с капустой', 'Блины'])
+        self.assertEqual(self.names('капусты'),
+                         ['Пироги с капустой', 'Капустный салат'])
+        self.assertEqual(self.names('торт'), [])
+
+    def test_index_follows_changes(self):
+        recipe = Recipe.objects.get(name='Блины')
+        recipe.name = 'Блины с творогом'
+        recipe.save()
+        self.assertEqual(self.names('творог'), ['Блины с творогом'])
+        recipe.delete()
+        self.assertEqual(self.names('пирог'), ['Пироги с капустой'])
+
+    def test_cursor_pages_through_every_result(self):
+        for i in range(8):
+            Recipe.objects.create(author=self.author, name=f'Пирог {i}',
+                                  text='Текст ' * i, cooking_time=10)
+        expected = set(Recipe.objects.filter(
+            name__startswith='П').values_list('id', flat=True))
+        ids = []
+        response = self.client.get('/api/recipes/', {
+            'search': 'пирог', 'limit': 3, 'cursor': ''}).json()
+        while True:
+            ids += [recipe['id'] for recipe in response['results']]
+            self.assertLessEqual(len(ids), len(expected) + 1)
+            if not response['next']:
+                break
+            response = self.client.get(response['next']).json()
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), expected | {
+            Recipe.objects.get(name='Блины').id})
+
+
+class ShortLinkTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+
+    def setUp(self):
+        resolve_short_id.cache_clear()
+        self.client = APIClient()
+
+    def create_recipe(self, **kwargs):
+        return Recipe.objects.create(author=self.author, name='Рецепт',
+                                     text='Текст', cooking_time=10, **kwargs)
+
+    def test_short_id_is_derived_from_pk(self):
+        recipe = self.create_recipe()
+        self.assertEqual(recipe.short_id, encode_short_id(recipe.pk))
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).short_id,
+                         recipe.short_id)
+        for pk in (0, 1, 61, 62, 10 ** 9):
+            self.assertEqual(decode_short_id(encode_short_id(pk)), pk)
+
+    def test_redirect_is_permanent_and_cached(self):
+        recipe = self.create_recipe()
+        legacy = self.create_recipe(short_id='aB3xY')
+        for item in (recipe, legacy):
+            response = self.client.get(f'/s/{item.short_id}/')
+            self.assertEqual(response.status_code,
+                             HTTPStatus.MOVED_PERMANENTLY)
+            self.assertTrue(response['Location'].endswith(
+                f'/recipes/{item.pk}/'))
+            self.assertIn('max-age=', response['Cache-Control'])
+            with self.assertNumQueries(0):
+                self.client.get(f'/s/{item.short_id}/')
+        self.assertEqual(self.client.get(
+            f'/s/{encode_short_id(legacy.pk)}/').status_code,
+            HTTPStatus.NOT_FOUND)
+        recipe.delete()
+        self.assertEqual(self.client.get(f'/s/{recipe.short_id}/').status_code,
+                         HTTPStatus.NOT_FOUND)
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone as django_timezone
+
+from . import constants as const
+from .models import Recipe, TrendingEpoch
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+EPOCH_MAX_AGE = timedelta(days=const.TRENDING_EPOCH_MAX_AGE_DAYS)
+EPOCH_LOCK_MARGIN = timedelta(days=1)
+
+
+def trending_weight(created, weight, epoch):
+    """Forward-decayed weight of an action.
+
+    Every weight grows by 2 ** (age / half-life) from the epoch, so the
+    sum stored in Recipe.trending_score orders recipes exactly as the
+    time-decayed score would, and adding or removing an action is a
+    single increment. The factor would overflow a float some twenty
+    years after the epoch, so the epoch is moved forward regularly.
+    """
+    days = (created - epoch).total_seconds() / 86400
+    return weight * 2 ** (days / const.TRENDING_HALF_LIFE_DAYS)
+
+
+def get_trending_epoch():
+    return TrendingEpoch.objects.get_or_create(
+        pk=1, defaults={'epoch': EPOCH})[0].epoch
+
+
+def epoch_is_due(epoch, now, margin=timedelta(0)):
+    return now - epoch > EPOCH_MAX_AGE - margin
+
+
+@transaction.atomic
+def move_trending_epoch(now, rescale=True):
+    """Move a due epoch to now, keeping the order of recipes.
+
+    The epoch row stays locked until the stored scores are rescaled;
+    rebuild_counters passes rescale=False as it writes new scores itself.
+    Returns the epoch in effect.
+    """
+    current, _ = TrendingEpoch.objects.select_for_update().get_or_create(
+        pk=1, defaults={'epoch': EPOCH})
+    if not epoch_is_due(current.epoch, now):
+        return current.epoch
+    if rescale:
+        Recipe.objects.update(trending_score=F('trending_score') * (
+            trending_weight(current.epoch, 1, now)))
+    current.epoch = now
+    current.save(update_fields=['epoch'])
+    return now
+
+
+def add_trending_score(recipe_id, created, weight, epoch):
+    Recipe.objects.filter(pk=recipe_id).update(
+        trending_score=F('trending_score') + trending_weight(
+            created, weight, epoch))
+
+
+def change_trending_score(recipe_id, created, weight):
+    """Add a weight measured from the epoch the scores are stored in.
+
+    Close to the time the epoch may be moved, the epoch row is locked
+    for the increment, so it is applied either before the rescale or
+    after it with the new epoch, never with the old one after it.
+    """
+    epoch = get_trending_epoch()
+    if not epoch_is_due(epoch, django_timezone.now(), EPOCH_LOCK_MARGIN):
+        add_trending_score(recipe_id, created, weight, epoch)
+        return
+    with transaction.atomic():
+        epoch = TrendingEpoch.objects.select_for_update().get(pk=1).epoch
+        add_trending_score(recipe_id, created, weight, epoch)
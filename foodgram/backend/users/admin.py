@@ -7,7 +7,8 @@ User = get_user_model()
 
 @admin.register(User)
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'email', 'username', 'first_name', 'last_name')
+    list_display = ('id', 'email', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count')
     list_filter = ('email', 'username')
     search_fields = ('first_name', 'last_name', 'email')
     ordering = ('email',)
@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+
+from . import constants as const
+
+User = get_user_model()
+
+
+def get_cache_key(key):
+    return const.AUTH_TOKEN_CACHE_KEY.format(key=key)
+
+
+def forget_tokens(*keys):
+    """Drop cached users so the next request checks the database again"""
+    cache.delete_many([get_cache_key(key) for key in keys])
+
+
+def cached_fields():
+    """Attributes kept in the cache: no password hash, no counters"""
+    return [field.attname for field in User._meta.concrete_fields
+            if field.name not in ('password', *User.derived_fields)]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that keeps the token owner in the cache.
+
+    Only the first request with a token joins the token and user tables.
+    Later ones build the user from cached field values, and the password
+    hash and counters stay deferred, so they are loaded from the database
+    only when used. The entry is dropped when the token is deleted on
+    logout or the user is saved, so logout and deactivation apply at once.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_cache_key(key)
+        values = cache.get(cache_key)
+        if values is None:
+            user, _ = super().authenticate_credentials(key)
+            cache.set(cache_key, {name: getattr(user, name)
+                                  for name in cached_fields()},
+                      const.AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, key
+        user = User.from_db(router.db_for_read(User), list(values),
+                            list(values.values()))
+        return user, key
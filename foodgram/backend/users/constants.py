@@ -1,3 +1,5 @@
 MAX_LENGTH_FIRST_NAME = 150
 MAX_LENGTH_LAST_NAME = 150
 MAX_LENGTH_EMAIL = 254
+AUTH_TOKEN_CACHE_KEY = 'auth_token:{key}'
+AUTH_TOKEN_CACHE_TIMEOUT = 60 * 60
@@ -1,5 +1,7 @@
 import re
 
+from core.images import VariantImageField
+from core.utils import PartialSaveMixin
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -7,7 +9,7 @@ from django.db import models
 from . import constants as const
 
 
-class CustomUser(AbstractUser):
+class CustomUser(PartialSaveMixin, AbstractUser):
     first_name = models.CharField(max_length=const.MAX_LENGTH_FIRST_NAME,
                                   blank=False, null=False)
     last_name = models.CharField(max_length=const.MAX_LENGTH_LAST_NAME,
@@ -15,10 +17,20 @@ class CustomUser(AbstractUser):
     email = models.EmailField(max_length=const.MAX_LENGTH_EMAIL,
                               unique=True,
                               blank=False, null=False)
-    avatar = models.ImageField(upload_to='users_avatar/',
+    avatar = VariantImageField(upload_to='users_avatar/',
                                blank=True,
                                null=True,
                                verbose_name='Аватар пользователя')
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов')
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков')
+
+    derived_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
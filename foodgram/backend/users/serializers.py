@@ -1,4 +1,4 @@
-from core.utils import Base64ImageField
+from core.utils import Base64ImageField, ImageVariantsField
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserCreateSerializer
 from interaction.models import Followers
@@ -8,6 +8,19 @@ from rest_framework import serializers
 User = get_user_model()
 
 
+def get_followed_author_ids(request):
+    ''' Ids of authors the requesting user follows, loaded once '''
+    if not hasattr(request, 'followed_author_ids'):
+        request.followed_author_ids = set(Followers.objects.filter(
+            user=request.user).values_list('author_id', flat=True))
+    return request.followed_author_ids
+
+
+def reset_followed_author_ids(request):
+    if hasattr(request, 'followed_author_ids'):
+        del request.followed_author_ids
+
+
 class UserCreationSerializer(UserCreateSerializer):
 
     class Meta(UserCreateSerializer.Meta):
@@ -19,21 +32,20 @@ class UserCreationSerializer(UserCreateSerializer):
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField(required=False)
+    avatar_variants = ImageVariantsField(source='avatar')
 
     class Meta:
         model = User
         fields = ('id', 'username', 'first_name',
-                  'last_name', 'email', 'is_subscribed', 'avatar')
+                  'last_name', 'email', 'is_subscribed', 'avatar',
+                  'avatar_variants')
 
     def get_is_subscribed(self, obj):
         ''' Сhecks the user is subscribed to the author of the request '''
         request = self.context.get('request')
         if (request and request.user.is_authenticated and not
                 request.user.is_anonymous):
-            return Followers.objects.filter(
-                user=request.user,
-                author=obj
-            ).exists()
+            return obj.id in get_followed_author_ids(request)
         return False
 
 
@@ -46,7 +58,7 @@ class UserAvatarSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         instance.avatar = validated_data.get('avatar', instance.avatar)
-        instance.save()
+        instance.save(update_fields=['avatar'])
         return instance
 
     def validate(self, attrs):
@@ -64,7 +76,6 @@ class RecipeShortSerializer(serializers.ModelSerializer):
 class UserSubscribeSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -76,14 +87,11 @@ class UserSubscribeSerializer(serializers.ModelSerializer):
         return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit_str = request.query_params.get(
-            'recipes_limit') if request else None
-        if limit_str:
-            limit = int(limit_str)
-            recipes = obj.recipes.all()[:limit]
-            return RecipeShortSerializer(recipes, many=True).data
-        return RecipeShortSerializer(obj.recipes.all(), many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            limit = self.context.get('recipes_limit')
+            if limit is not None:
+                recipes = recipes[:limit]
+        return RecipeShortSerializer(recipes, many=True).data
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """ Logout takes effect for the cached token at once """
+    forget_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_changed_user(sender, instance, created, **kwargs):
+    """ Requests with the user's token should see the saved changes """
+    if not created:
+        forget_tokens(*Token.objects.filter(
+            user=instance).values_list('key', flat=True))
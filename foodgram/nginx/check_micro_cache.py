@@ -0,0 +1,99 @@
+"""Check the gateway micro-cache of a running stack.
+
+    python nginx/check_micro_cache.py --base-url http://localhost:8000 \
+        --token <token> --recipe-id <id of a recipe of the token owner>
+
+Anonymous GETs must be served from the cache after the first request,
+requests with an Authorization header must bypass it, and editing a
+recipe must purge the cached recipe pages.
+"""
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+from collections import Counter
+
+PATHS = (
+    '/api/recipes/?limit=6',
+    '/api/recipes/?page=2&limit=6',
+    '/api/tags/',
+    '/api/ingredients/?name=%D1%81',
+)
+
+
+def fetch(url, token=None, method='GET', data=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Token {token}'
+    request = urllib.request.Request(url, data=data, method=method,
+                                     headers=headers)
+    with urllib.request.urlopen(request) as response:
+        body = response.read()
+        return response.headers.get('X-Cache-Status', '-'), body
+
+
+def unchanged_recipe(body):
+    """PATCH payload that saves the recipe as it is"""
+    recipe = json.loads(body)
+    return json.dumps({
+        'name': recipe['name'],
+        'text': recipe['text'],
+        'cooking_time': recipe['cooking_time'],
+        'ingredients': [{'id': item['id'], 'amount': item['amount']}
+                        for item in recipe['ingredients']],
+        'tags': [tag['id'] for tag in recipe['tags']],
+    }).encode()
+
+
+def statuses(url, count, token=None):
+    return Counter(fetch(url, token)[0] for _ in range(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--min-hit-rate', type=float, default=0.9)
+    parser.add_argument('--token')
+    parser.add_argument('--recipe-id', type=int)
+    args = parser.parse_args()
+    failures = []
+
+    for path in PATHS:
+        result = statuses(args.base_url + path, args.requests)
+        rate = result['HIT'] / args.requests
+        print(f'anonymous {path}: hit rate {rate:.0%} {dict(result)}')
+        if rate < args.min_hit_rate:
+            failures.append(f'{path}: hit rate {rate:.0%}')
+
+    if args.token:
+        for path in PATHS:
+            result = statuses(args.base_url + path, args.requests,
+                              args.token)
+            print(f'authorized {path}: {dict(result)}')
+            if set(result) != {'BYPASS'}:
+                failures.append(f'{path}: authorized request was cached')
+
+    if args.token and args.recipe_id:
+        url = f'{args.base_url}/api/recipes/{args.recipe_id}/'
+        fetch(url)
+        before, body = fetch(url)
+        try:
+            fetch(url, args.token, 'PATCH', unchanged_recipe(body))
+        except urllib.error.HTTPError as error:
+            failures.append(f'{url}: edit failed with {error.code} '
+                            f'{error.read().decode()}')
+        else:
+            after, _ = fetch(url)
+            print(f'purge {url}: {before} before the edit, {after} after it')
+            if before != 'HIT' or after == 'HIT':
+                failures.append(f'{url}: edit did not purge the cache')
+
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from cats.models import Cat
+
+
+def walk(directory):
+    """Stream (name, mtime) of the files below a media directory"""
+    with os.scandir(os.path.join(settings.MEDIA_ROOT, directory)) as entries:
+        for entry in entries:
+            name = f'{directory}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.stat().st_mtime
+
+
+class Command(BaseCommand):
+    help = 'Remove cat images no longer referenced by any cat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the files to remove')
+        parser.add_argument('--min-age', type=int, default=60 * 60,
+                            help='Keep files changed in the last N seconds')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        directory = Cat._meta.get_field('image').upload_to.strip('/')
+        referenced = set(
+            Cat.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True)
+            .iterator(chunk_size=options['batch_size']))
+        cutoff = time.time() - options['min_age']
+        removed = 0
+        batch = []
+        if os.path.isdir(os.path.join(settings.MEDIA_ROOT, directory)):
+            for name, mtime in walk(directory):
+                if mtime > cutoff or name in referenced:
+                    continue
+                batch.append(name)
+                if len(batch) == options['batch_size']:
+                    removed += self.remove(batch, options['dry_run'])
+                    batch = []
+        removed += self.remove(batch, options['dry_run'])
+        self.stdout.write(f'{removed} unreferenced files '
+                          f'{"found" if options["dry_run"] else "removed"}')
+
+    def remove(self, names, dry_run):
+        for name in names:
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+        return len(names)